@@ -1,22 +1,26 @@
+import os
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 import streamlit as st
 from data import load_data
-from model import train_model, predict
+from model import train_model, predict, explain_prediction
+from registry import ModelWatcher, get_current_version
 from components import article_view, report_dialog, login_view, register_view
-import sqlite3
+import metrics
+from backends import backends, default_backend
+from benchmark import benchmark_backends, select_backend
 from db import (
     init_db,
     insert_article,
     fetch_popular_articles,
     fetch_recent_articles,
     add_user_article_relation,
-    fetch_all_reports
+    fetch_all_reports,
+    fetch_article,
+    get_guest_user_id,
+    get_write_buffer
 )
 
-# Initialize session state for articles and selected article
-if "popular_articles" not in st.session_state:
-    st.session_state["popular_articles"] = None
-if "recent_articles" not in st.session_state:
-    st.session_state["recent_articles"] = None
+# Initialize session state for the selected article
 if "selected_article" not in st.session_state:
     st.session_state["selected_article"] = None
 if "user" not in st.session_state:
@@ -34,32 +38,61 @@ data = load_data()
 # Initialize the SQLite database with CSV data
 init_db(data)
 
-# Helper function to get the guest user ID
-def get_guest_user_id():
-    conn = sqlite3.connect("articles.db")
-    c = conn.cursor()
-    guest_user_id = c.execute("SELECT id FROM users WHERE username = 'guest'").fetchone()[0]
-    conn.close()
-    return guest_user_id
+
+# Model backend: a name from backends.py, or "auto" for the fastest one meeting ACCURACY_FLOOR
+model_backend = os.getenv("MODEL_BACKEND", default_backend)
+model_alpha = os.getenv("MODEL_ALPHA")
+
+# Seconds a submission waits for the write buffer to commit its article
+write_timeout = float(os.getenv("DB_WRITE_TIMEOUT", "10"))
+
+
+def startup_alpha(backend):
+    if model_alpha is not None:
+        return float(model_alpha)
+    return 0.1 if backend == default_backend else None  # Other backends use their own default
 
 
 # Train model
-@st.cache_resource
-def get_trained_model(data):
-    return train_model(data, alpha=0.1)
+def train_startup_model(data):
+    backend = model_backend
+    if backend == "auto":
+        # Benchmark each backend with the alpha it would be trained with, so the floor checks the shipped model
+        results = benchmark_backends(data, alpha={name: startup_alpha(name) for name in backends})
+        backend = select_backend(results, float(os.getenv("ACCURACY_FLOOR", "0"))) or default_backend
+    return train_model(data, alpha=startup_alpha(backend), backend=backend)
 
-model, vectorizer, accuracy= get_trained_model(data)
+
+# Serve the current published model, a watcher swaps in versions published by any replica
+@st.cache_resource
+def get_model_watcher(data):
+    if os.getenv("MODEL_TRAIN_ON_STARTUP", "1") != "0" or get_current_version() is None:
+        train_startup_model(data)
+    return ModelWatcher(
+        interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "5")),
+        compact_only=os.getenv("MODEL_SERVE_COMPACT", "1") != "0",
+    ).start()
+
+
+# Take the model and vectorizer together once per rerun so a swap never mixes versions
+loaded_model = get_model_watcher(data).get()
+if loaded_model is None:
+    st.error("No model is available yet. Check the model registry and try again shortly.")
+    st.stop()
+model_version, model, vectorizer, model_metadata, compact_model = loaded_model
+accuracy = model_metadata["accuracy"]
 st.session_state['accuracy'] = accuracy
 
-# Fetch articles only if they are not already in session state
-if st.session_state["popular_articles"] is None:
-    st.session_state["popular_articles"] = fetch_popular_articles(limit=5)
-if st.session_state["recent_articles"] is None:
-    st.session_state["recent_articles"] = fetch_recent_articles(limit=5)
 
-# Use session state to access articles
-popular_articles = st.session_state["popular_articles"]
-recent_articles = st.session_state["recent_articles"]
+# Explanations only depend on the article and the model version, so compute each one once per process
+@st.cache_data(max_entries=1024)
+def get_article_explanation(article_id, version, _text, _model, _vectorizer, _compact):
+    return explain_prediction(_model, _vectorizer, _text, compact=_compact)
+
+
+# Fetch articles through the process-wide query cache, which is refreshed after every write
+popular_articles = fetch_popular_articles(limit=5)
+recent_articles = fetch_recent_articles(limit=5)
 
 # User authentication
 if st.session_state["user"]:
@@ -80,6 +113,16 @@ else:
 # App layout
 
 if st.session_state["user"] and st.session_state["user"][3] == "admin":
+    # Metrics panel
+    with st.sidebar.expander("Metrics"):
+        st.dataframe([
+            {"function": name, "calls": stats["count"], "errors": stats["errors"], "slow": stats["slow"],
+             "mean ms": stats["mean_seconds"] * 1000, "max ms": stats["max_seconds"] * 1000}
+            for name, stats in metrics.snapshot().items()
+        ], hide_index=True)
+        st.download_button("Prometheus export", metrics.to_prometheus(), file_name="metrics.txt")
+        st.download_button("JSON export", metrics.to_json(), file_name="metrics.json")
+
     reports = fetch_all_reports()
     st.sidebar.button(f"{len(reports)} Reports")
     st.sidebar.write("Reports:")
@@ -88,17 +131,14 @@ if st.session_state["user"] and st.session_state["user"][3] == "admin":
         article_id, title, report_content, user_id = report
         if st.sidebar.button(f"{title} - Reported by User {user_id}", key=f"report_{article_id}_{user_id}"):
             # Fetch current article label and content
-            conn = sqlite3.connect("articles.db")
-            c = conn.cursor()
-            c.execute("SELECT label, content FROM articles WHERE id = ?", (article_id,))
-            article_info = c.fetchone()
-            conn.close()
+            article_info = fetch_article(article_id)
 
             # Trigger the dialog
             report_dialog(
                 {"user_id": user_id, "article_id": article_id, "report_content": report_content, "title": title},
                 article_label=article_info[0],
-                article_content=article_info[1]
+                article_content=article_info[1],
+                explanation=get_article_explanation(article_id, model_version, f"{title} {article_info[1]}", model, vectorizer, compact_model)
             )
 
 col1, col2 = st.columns([3, 2])
@@ -113,15 +153,8 @@ with col1:
     if st.button("Check Validity"):
         if title_input and content_input:
             combined_input = f"{title_input} {content_input}"
-            prediction = predict(model, vectorizer, combined_input)
+            prediction = predict(model, vectorizer, combined_input, compact=compact_model)
 
-            # Determine the user to associate the article with
-            if st.session_state["user"]:
-                user_id = st.session_state["user"][0]  # Logged-in user's ID
-            else:
-                user_id = get_guest_user_id()  # Guest user's ID
-
-            # Save the article and associate it with the user
             # Determine the user to associate the article with
             if st.session_state["user"]:
                 user_id = st.session_state["user"][0]  # Logged-in user's ID
@@ -130,10 +163,20 @@ with col1:
 
             # Save the article and associate it with the user
             label = "FAKE" if prediction == "FAKE" else "REAL"
-            article_id = insert_article(title_input, content_input, label)
-            add_user_article_relation(user_id, article_id)
-            article_id = insert_article(title_input, content_input, label)
-            add_user_article_relation(user_id, article_id)
+            write_buffer = get_write_buffer()
+            if write_buffer is not None:
+                # Concurrent submissions share one transaction, wait for ours to commit
+                write = write_buffer.insert_article(title_input, content_input, label, user_id=user_id)
+                try:
+                    write.result(timeout=write_timeout)
+                except FuturesTimeoutError:
+                    if write.cancel():
+                        st.warning("The article could not be saved in time, please submit it again.")
+                    else:
+                        st.warning("Saving the article is taking longer than usual, it will appear in the lists shortly.")
+            else:
+                article_id = insert_article(title_input, content_input, label)
+                add_user_article_relation(user_id, article_id)
 
             # Display result
             if label == "FAKE":
@@ -147,16 +190,18 @@ with col1:
 with col2:
     st.write("Popular Articles")
     for article in popular_articles:
-        article_id, title, content, label, user_count, confidence = article
+        article_id, title, content, label, confidence, user_count = article
         #st.write(f"{title} (Linked Users: {user_count})")
         if st.button(f"View {title}", key=f"popular_{article_id}"):
-            st.session_state["selected_article"] = {"id": article_id, "title": title, "content": content, "label": label, "confidence": confidence}
+            explanation = get_article_explanation(article_id, model_version, f"{title} {content}", model, vectorizer, compact_model)
+            st.session_state["selected_article"] = {"id": article_id, "title": title, "content": content, "label": label, "confidence": confidence, "explanation": explanation}
 
     st.write("Recent Articles")
     for article in recent_articles:
         id, title, content, label, confidence = article
         if st.button(title, key=f"recent_{id}"):
-                    st.session_state["selected_article"] = {"title": title, "content": content, "label": label, "confidence": confidence}
+                    explanation = get_article_explanation(id, model_version, f"{title} {content}", model, vectorizer, compact_model)
+                    st.session_state["selected_article"] = {"id": id, "title": title, "content": content, "label": label, "confidence": confidence, "explanation": explanation}
 
 # Display selected article in a dialog
 if st.session_state["selected_article"]:
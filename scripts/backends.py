@@ -0,0 +1,82 @@
+import os
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import ComplementNB, MultinomialNB
+from utils import tokenize
+from vectorize import ParallelCountVectorizer
+
+# Worker processes for building the vocabulary, 0 means one per CPU. Serial by default:
+# run `benchmark.py --vectorizer-workers` on the training host before raising it
+vectorizer_jobs = int(os.getenv("VECTORIZER_JOBS", "1")) or None
+
+
+class Backend:
+    """
+    A vectorizer and classifier pair that train_model can fit.
+    alpha is passed to the classifier's own alpha parameter: smoothing for the
+    naive Bayes variants, regularization strength for the linear model.
+    """
+
+    name = None
+    model_type = None
+    vectorizer_type = "ParallelCountVectorizer"
+    default_alpha = 1.0
+
+    def __init__(self, alpha=None):
+        self.alpha = self.default_alpha if alpha is None else alpha
+
+    def make_vectorizer(self):
+        # Input is already normalized by utils.prepare_texts or utils.clean_text
+        return ParallelCountVectorizer(analyzer=tokenize, n_jobs=vectorizer_jobs)
+
+    def vectorizer_key(self):
+        """Backends with equal keys produce identical features and can share them."""
+        return self.vectorizer_type
+
+    def make_classifier(self):
+        raise NotImplementedError
+
+    def mlflow_params(self):
+        return {
+            "backend": self.name,
+            "model_type": self.model_type,
+            "vectorizer": self.vectorizer_type,
+            "alpha": self.alpha,
+        }
+
+
+class MultinomialNBBackend(Backend):
+    name = "multinomial_nb"
+    model_type = "MultinomialNB"
+
+    def make_classifier(self):
+        return MultinomialNB(alpha=self.alpha)
+
+
+class ComplementNBBackend(Backend):
+    name = "complement_nb"
+    model_type = "ComplementNB"
+
+    def make_classifier(self):
+        return ComplementNB(alpha=self.alpha)
+
+
+class SGDBackend(Backend):
+    name = "sgd"
+    model_type = "SGDClassifier"
+    default_alpha = 1e-4
+
+    def make_classifier(self):
+        # Logistic loss keeps predict_proba available for confidence scores
+        return SGDClassifier(loss="log_loss", alpha=self.alpha, max_iter=50, tol=1e-3, random_state=42)
+
+
+backends = {backend.name: backend for backend in (MultinomialNBBackend, ComplementNBBackend, SGDBackend)}
+default_backend = MultinomialNBBackend.name
+
+
+def get_backend(name=None, alpha=None):
+    """Create a backend by name."""
+    name = name or default_backend
+    if name not in backends:
+        raise ValueError(f"Unknown backend: {name}. Choose one of {', '.join(backends)}")
+    return backends[name](alpha=alpha)
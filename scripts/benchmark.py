@@ -0,0 +1,182 @@
+import os
+import time
+import pickle
+import argparse
+import tempfile
+import threading
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score
+from backends import backends, get_backend
+from utils import clean_text, clear_token_cache, prepare_texts, tokenize
+from vectorize import ParallelCountVectorizer
+
+
+def benchmark_backends(data, names=None, alpha=None, test_size=0.2, latency_sample=200, random_state=42):
+    """
+    Measures training time, per-document and batch inference latency, model size and accuracy
+    for each backend. Backends that share a vectorizer configuration are trained and scored
+    on the same cached features. alpha is one value for every backend or a dict by backend name.
+    """
+    texts = np.asarray(prepare_texts(data), dtype=object)
+    y = np.asarray(data['label'])
+    train_idx, test_idx = train_test_split(np.arange(len(texts)), test_size=test_size, random_state=random_state)
+    raw_texts = np.asarray(data['title'] + " " + data['content'], dtype=object)
+    sample = raw_texts[test_idx][:latency_sample]
+
+    features = {}
+    results = []
+    for name in names or list(backends):
+        backend = get_backend(name, alpha=alpha.get(name) if isinstance(alpha, dict) else alpha)
+        key = backend.vectorizer_key()
+        if key not in features:
+            vectorizer = backend.make_vectorizer()
+            start = time.perf_counter()
+            x_train = vectorizer.fit_transform(texts[train_idx])
+            vectorize_seconds = time.perf_counter() - start
+            features[key] = (vectorizer, x_train, vectorizer.transform(texts[test_idx]), vectorize_seconds)
+        vectorizer, x_train, x_test, vectorize_seconds = features[key]
+
+        model = backend.make_classifier()
+        start = time.perf_counter()
+        model.fit(x_train, y[train_idx])
+        train_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        predictions = model.predict(x_test)
+        batch_seconds = time.perf_counter() - start
+
+        # Per-document latency follows the serving path: normalize and vectorize one raw text, then predict
+        start = time.perf_counter()
+        for text in sample:
+            model.predict(vectorizer.transform([clean_text(text)]))
+        per_doc_seconds = (time.perf_counter() - start) / max(len(sample), 1)
+
+        results.append({
+            "backend": name,
+            "alpha": backend.alpha,
+            "accuracy": accuracy_score(y[test_idx], predictions),
+            "train_seconds": train_seconds,
+            "vectorize_seconds": vectorize_seconds,
+            "batch_seconds": batch_seconds,
+            "batch_docs_per_second": x_test.shape[0] / batch_seconds if batch_seconds else float("inf"),
+            "per_doc_ms": per_doc_seconds * 1000,
+            "model_bytes": len(pickle.dumps(model)),
+        })
+    return results
+
+
+def benchmark_vectorizer(data, worker_counts=(1, 2, 4), repeat=3):
+    """Time the vocabulary build and vectorization for each worker count, best of `repeat` runs."""
+    texts = list(prepare_texts(data))
+    results = []
+    for workers in worker_counts:
+        timings = []
+        for _ in range(repeat):
+            clear_token_cache()  # Measure tokenization, not cache hits
+            vectorizer = ParallelCountVectorizer(analyzer=tokenize, n_jobs=workers, min_parallel_docs=0)
+            start = time.perf_counter()
+            vectorizer.fit_transform(texts)
+            timings.append(time.perf_counter() - start)
+        results.append({"workers": workers, "seconds": min(timings), "cpus": available_cpus()})
+    for result in results:
+        result["speedup"] = results[0]["seconds"] / result["seconds"]
+    return results
+
+
+def available_cpus():
+    """CPUs this process may run on, which can be fewer than the machine has."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def benchmark_db_writes(db_path, rows=2000, writers=8, buffered=False, max_batch=100, max_delay=0.0):
+    """
+    Sustained insert throughput of article submissions (article plus user link) from concurrent
+    writers, each waiting for its own write like an app session does.
+    """
+    from db import WriteBuffer, add_user_article_relation, insert_article
+
+    buffer = WriteBuffer(db_path, max_batch=max_batch, max_delay=max_delay) if buffered else None
+
+    def write(worker):
+        for i in range(rows // writers):
+            title, content = f"Load test {worker}-{i}", f"Load test content {worker}-{i} " * 20
+            if buffer is not None:
+                buffer.insert_article(title, content, "REAL", user_id=1).result()
+            else:
+                article_id = insert_article(title, content, "REAL", db_path=db_path)
+                add_user_article_relation(1, article_id, db_path=db_path)
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if buffer is not None:
+        buffer.close()
+    seconds = time.perf_counter() - start
+    written = rows // writers * writers
+    return {
+        "buffered": buffered,
+        "rows": written,
+        "seconds": seconds,
+        "rows_per_second": written / seconds,
+        "transactions": buffer.batches if buffer is not None else written * 2,
+    }
+
+
+def select_backend(results, accuracy_floor):
+    """Return the name of the fastest backend per document that meets the accuracy floor, or None."""
+    candidates = [result for result in results if result["accuracy"] >= accuracy_floor]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda result: result["per_doc_ms"])["backend"]
+
+
+def main():
+    from data import load_data
+
+    parser = argparse.ArgumentParser(description="Benchmark classifier backends on the news dataset.")
+    parser.add_argument("--backends", nargs="*", choices=list(backends), help="Backends to compare (default: all)")
+    parser.add_argument("--accuracy-floor", type=float, default=0.0, help="Minimum accuracy for the selected backend")
+    parser.add_argument("--vectorizer-workers", nargs="*", type=int, help="Benchmark vectorization with these worker counts instead")
+    parser.add_argument("--db-writes", type=int, help="Benchmark this many article inserts with and without the write buffer instead")
+    parser.add_argument("--db-writers", type=int, default=8, help="Concurrent writers for --db-writes")
+    args = parser.parse_args()
+
+    if args.db_writes:
+        from db import init_db
+
+        print(f"{'buffered':<10}{'rows':>8}{'seconds':>10}{'rows/s':>10}{'commits':>10}")
+        for buffered in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                db_path = os.path.join(tmp, "articles.db")
+                init_db(load_data().head(0), db_path=db_path)
+                result = benchmark_db_writes(db_path, rows=args.db_writes, writers=args.db_writers, buffered=buffered)
+            print(f"{str(result['buffered']):<10}{result['rows']:>8}{result['seconds']:>10.3f}"
+                  f"{result['rows_per_second']:>10.1f}{result['transactions']:>10}")
+        return
+
+    if args.vectorizer_workers:
+        cpus = available_cpus()
+        print(f"Available CPUs: {cpus}")
+        if max(args.vectorizer_workers) > cpus:
+            print("More workers than CPUs, the extra workers only add overhead")
+        print(f"{'workers':<10}{'seconds':>10}{'speedup':>10}")
+        for result in benchmark_vectorizer(load_data(), worker_counts=args.vectorizer_workers):
+            print(f"{result['workers']:<10}{result['seconds']:>10.3f}{result['speedup']:>10.2f}")
+        return
+
+    results = benchmark_backends(load_data(), names=args.backends)
+    print(f"{'backend':<16}{'accuracy':>10}{'train s':>10}{'batch s':>10}{'doc ms':>10}{'size kB':>10}")
+    for result in results:
+        print(f"{result['backend']:<16}{result['accuracy']:>10.4f}{result['train_seconds']:>10.3f}"
+              f"{result['batch_seconds']:>10.4f}{result['per_doc_ms']:>10.3f}{result['model_bytes'] / 1024:>10.1f}")
+    print(f"Selected backend: {select_backend(results, args.accuracy_floor)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import sys
+import pickle
+import hashlib
+import argparse
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+from sklearn.naive_bayes import ComplementNB, MultinomialNB
+from utils import clean_text, tokenize
+
+
+def _term_key(term):
+    # Stable 64-bit key, Python's hash() is salted per process and cannot be stored
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _linear_form(model):
+    """Return (weights of shape features x classes, bias) so that scores = counts @ weights + bias."""
+    if isinstance(model, MultinomialNB):
+        return model.feature_log_prob_.T, model.class_log_prior_
+    if isinstance(model, ComplementNB):
+        bias = model.class_log_prior_ if len(model.classes_) == 1 else np.zeros(len(model.classes_))
+        return model.feature_log_prob_.T, bias
+    if isinstance(model, SGDClassifier) and model.coef_.shape[0] == 1:
+        return model.coef_.T, model.intercept_
+    raise ValueError(f"Unsupported model for compact inference: {type(model).__name__}")
+
+
+def _count_tokens(text):
+    counts = {}
+    for token in tokenize(clean_text(text)):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+class CompactModel:
+    """
+    Inference-only form of a fitted vectorizer and classifier pair.
+    The vocabulary is a sorted array of 64-bit term keys searched with np.searchsorted,
+    weights are float32 or uint8 quantized per class, and training counts are dropped.
+    """
+
+    def __init__(self, keys, weights, bias, classes, scale=None, offset=None):
+        self.keys = keys
+        self.weights = weights
+        self.bias = bias
+        self.classes = classes
+        self.scale = scale
+        self.offset = offset
+
+    @classmethod
+    def from_estimator(cls, model, vectorizer, dtype="float32"):
+        if vectorizer.analyzer is not tokenize:
+            raise ValueError("Compact models expect a vectorizer built with utils.tokenize")
+        weights, bias = _linear_form(model)
+        keys = np.fromiter((_term_key(term) for term in vectorizer.get_feature_names_out()), dtype=np.uint64)
+        order = np.argsort(keys)
+        keys = keys[order]
+        if np.any(keys[1:] == keys[:-1]):
+            raise ValueError("Term key collision, cannot build a compact vocabulary")
+        weights = weights[order]
+
+        scale = offset = None
+        if dtype == "float32":
+            weights = weights.astype(np.float32)
+        elif dtype == "uint8":
+            offset = weights.min(axis=0)
+            scale = (weights.max(axis=0) - offset) / 255
+            scale[scale == 0] = 1.0
+            weights = np.round((weights - offset) / scale).astype(np.uint8)
+        else:
+            raise ValueError(f"Unknown compact dtype: {dtype}")
+        return cls(keys, np.ascontiguousarray(weights), bias.astype(np.float64), np.asarray(model.classes_), scale, offset)
+
+    def _lookup(self, terms):
+        """Return a mask of the known terms and their weight rows, dequantized to float64."""
+        queries = np.fromiter((_term_key(term) for term in terms), dtype=np.uint64, count=len(terms))
+        positions = np.searchsorted(self.keys, queries)
+        positions[positions == len(self.keys)] = 0
+        known = self.keys[positions] == queries
+        rows = self.weights[positions[known]].astype(np.float64)
+        if self.scale is not None:
+            rows = rows * self.scale + self.offset
+        return known, rows
+
+    def decision(self, text):
+        """Per-class scores matching predict_joint_log_proba (naive Bayes) or decision_function (linear)."""
+        counts = _count_tokens(text)
+        scores = self.bias.copy()
+        if not counts:
+            return scores
+        known, rows = self._lookup(counts)
+        if not known.any():
+            return scores
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))[known]
+        return scores + values @ rows
+
+    def explain(self, text, top_n=10):
+        """
+        Same (token, weight) pairs as model.explain_prediction, positive weights push towards FAKE.
+        Naive Bayes weights are the FAKE minus REAL log probability times the token count.
+        """
+        counts = _count_tokens(text)
+        terms = sorted(counts)  # The vectorizer's feature order, so ties break the same way
+        if not terms:
+            return []
+        known, rows = self._lookup(terms)
+        terms = [term for term, is_known in zip(terms, known) if is_known]
+        values = np.array([counts[term] for term in terms], dtype=np.float64)
+
+        classes = list(self.classes)
+        if rows.shape[1] == 1:
+            # Binary linear models score classes[1] with a positive decision function
+            sign = 1 if classes[1] == "FAKE" else -1
+            weights = values * sign * rows[:, 0]
+        else:
+            weights = values * (rows[:, classes.index("FAKE")] - rows[:, classes.index("REAL")])
+
+        top = np.argsort(-np.abs(weights), kind="stable")[:top_n]
+        return [(terms[i], float(weights[i])) for i in top]
+
+    def predict(self, text):
+        scores = self.decision(text)
+        if len(scores) == 1:
+            return self.classes[int(scores[0] > 0)]
+        return self.classes[int(np.argmax(scores))]
+
+
+def model_bytes(*objects):
+    """Pickled size of the given objects."""
+    return sum(len(pickle.dumps(obj)) for obj in objects)
+
+
+def compare_models(model, vectorizer, texts, dtype="float32", tolerance=1e-4):
+    """
+    Build a compact model and report memory saved and how closely it reproduces the full model.
+    Score differences are relative to the size of the full model's scores.
+    """
+    compact = CompactModel.from_estimator(model, vectorizer, dtype=dtype)
+    x = vectorizer.transform([clean_text(text) for text in texts])
+    if hasattr(model, "predict_joint_log_proba"):
+        full_scores = model.predict_joint_log_proba(x)
+    else:
+        full_scores = model.decision_function(x).reshape(-1, 1)
+    compact_scores = np.array([compact.decision(text) for text in texts])
+
+    relative_error = np.abs(compact_scores - full_scores) / np.maximum(np.abs(full_scores), 1.0)
+    full_predictions = model.predict(x)
+    compact_predictions = np.array([compact.predict(text) for text in texts])
+
+    full_size = model_bytes(model, vectorizer)
+    compact_size = model_bytes(compact)
+    return {
+        "dtype": dtype,
+        "full_bytes": full_size,
+        "compact_bytes": compact_size,
+        "saved_bytes": full_size - compact_size,
+        "max_relative_error": float(relative_error.max()),
+        "agreement": float(np.mean(full_predictions == compact_predictions)),
+        "within_tolerance": bool(relative_error.max() <= tolerance),
+    }
+
+
+def main(argv=None):
+    from data import load_data
+    from registry import get_current_version, load_version
+
+    parser = argparse.ArgumentParser(description="Compare the published model with its compact inference form.")
+    parser.add_argument("--version", default=None, help="Model version (default: current)")
+    parser.add_argument("--dtype", choices=["float32", "uint8"], default="float32")
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Maximum relative score error")
+    parser.add_argument("--sample", type=int, default=1000, help="Number of articles to compare on")
+    args = parser.parse_args(argv)
+
+    loaded = load_version(args.version or get_current_version())
+    data = load_data()
+    texts = list((data['title'] + " " + data['content'])[:args.sample])
+    report = compare_models(loaded.model, loaded.vectorizer, texts, dtype=args.dtype, tolerance=args.tolerance)
+
+    print(f"Model version: {loaded.version}")
+    print(f"Size: {report['full_bytes'] / 1024:.1f} kB -> {report['compact_bytes'] / 1024:.1f} kB "
+          f"({report['saved_bytes'] / 1024:.1f} kB saved)")
+    print(f"Max relative score error: {report['max_relative_error']:.2e} (tolerance {args.tolerance:.0e})")
+    print(f"Prediction agreement: {report['agreement'] * 100:.2f}%")
+    return 0 if report["within_tolerance"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
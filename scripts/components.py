@@ -1,7 +1,13 @@
+import io
+import pandas as pd
 import streamlit as st
+import matplotlib
 import matplotlib.pyplot as plt
 from db import authenticate_user, register_user, add_report, delete_report, delete_article, toggle_article_label
 
+matplotlib.use("Agg")  # Render off-screen, the server never opens GUI windows
+
+
 @st.dialog("Article details", width="large")
 def article_view(data):
     """Display article details inline, with report functionality."""
@@ -12,6 +18,7 @@ def article_view(data):
     else:
         st.success("This news is likely REAL.")
     st.write(data['content'])
+    explanation_view(data.get('explanation'))
 
     # Conditional report button
     if user and user[1] != "guest" and user[3] != "admin":
@@ -39,6 +46,16 @@ def article_view(data):
 
 
 
+def explanation_view(explanation):
+    """Show the tokens that contributed most to the article's classification."""
+    if not explanation:
+        return
+    st.write("**Why the model chose this label:**")
+    weights = pd.DataFrame(explanation, columns=["Token", "Weight"]).set_index("Token")
+    st.bar_chart(weights, horizontal=True)
+    st.caption("Positive weights point towards FAKE, negative weights towards REAL.")
+
+
 def list_articles(articles):
     """List articles as clickable buttons."""
     for idx, row in articles.iterrows():
@@ -79,13 +96,14 @@ def report():
 
 
 @st.dialog("Report Details", width="large")
-def report_dialog(report, article_label, article_content):
+def report_dialog(report, article_label, article_content, explanation=None):
     """
     Dialog for admin to interact with a report.
     Args:
         report (dict): Contains report details (user_id, article_id, report_content, title).
         article_label (str): The current label of the article ('FAKE' or 'REAL').
         article_content (str): The full content of the article.
+        explanation (list): Top (token, weight) pairs behind the model's prediction.
     """
     st.markdown(f"### Report by User {report['user_id']}")
 
@@ -103,6 +121,7 @@ def report_dialog(report, article_label, article_content):
     st.markdown("---")
     st.write("**Article Content:**")
     st.write(article_content)
+    explanation_view(explanation)
 
     # Buttons for actions
     if "action_taken" not in st.session_state:
@@ -131,6 +150,34 @@ def report_dialog(report, article_label, article_content):
         st.success("Action completed successfully.")
 
 
+def render_bar_chart(labels, sizes, colors, title):
+    """Render a proportion bar chart to PNG bytes and release the figure."""
+    fig, ax = plt.subplots()
+    try:
+        bars = ax.bar(labels, sizes, color=colors)
+        ax.set_ylim(0, 1)  # Set the y-axis limit to 0-1
+        ax.set_ylabel('Proportion')
+        ax.set_title(title)
+        ax.bar_label(bars, labels=[f'{s * 100:.1f}%' for s in sizes], label_type='edge')
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+    finally:
+        plt.close(fig)  # Figures are never garbage collected while pyplot tracks them
+    return buffer.getvalue()
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_bar_chart(labels, sizes, colors, title):
+    """Cache rendered charts by their inputs so reruns do not redraw them."""
+    return render_bar_chart(labels, sizes, colors, title)
+
+
+def bar_chart(labels, sizes, colors, title):
+    # Round to the displayed precision so near-identical inputs share a cache entry
+    sizes = tuple(round(s, 4) for s in sizes)
+    st.image(cached_bar_chart(tuple(labels), sizes, tuple(colors), title))
+
+
 def data_breakdown(data):
     accuracy = float(st.session_state['accuracy'])
     confidence = 1 - float(data['confidence'])
@@ -143,41 +190,14 @@ def data_breakdown(data):
 
     with col1:
         st.write("Model accuracy")
-        labels = ['Correct', 'Incorrect']
-        sizes = [accuracy, 1 - accuracy]
-
-        fig, ax = plt.subplots()
-        bars = ax.bar(labels, sizes, color=['green', 'red'])
-        ax.set_ylim(0, 1)  # Set the y-axis limit to 0-1
-        ax.set_ylabel('Proportion')
-        ax.set_title('Model Accuracy')
-        ax.bar_label(bars, labels=[f'{s * 100:.1f}%' for s in sizes], label_type='edge')
-        st.pyplot(fig)
+        bar_chart(['Correct', 'Incorrect'], [accuracy, 1 - accuracy], ['green', 'red'], 'Model Accuracy')
 
     with col2:
         st.write("Classification confidence")
-        labels = ['True', 'Fake']
-        sizes = [confidence, 1 - confidence]
-
-        fig, ax = plt.subplots()
-        bars = ax.bar(labels, sizes, color=['blue', 'orange'])
-        ax.set_ylim(0, 1)  # Set the y-axis limit to 0-1
-        ax.set_ylabel('Proportion')
-        ax.set_title('Classification Confidence')
-        ax.bar_label(bars, labels=[f'{s * 100:.1f}%' for s in sizes], label_type='edge')
-        st.pyplot(fig)
+        bar_chart(['True', 'Fake'], [confidence, 1 - confidence], ['blue', 'orange'], 'Classification Confidence')
 
     st.write("Probability of correct classification")
-    labels = ['Correct', 'Incorrect']
-    sizes = [likelyhood, 1 - likelyhood]
-
-    fig, ax = plt.subplots()
-    bars = ax.bar(labels, sizes, color=['green', 'red'])
-    ax.set_ylim(0, 1)  # Set the y-axis limit to 0-1
-    ax.set_ylabel('Proportion')
-    ax.set_title('Probability of Correct Classification')
-    ax.bar_label(bars, labels=[f'{s * 100:.1f}%' for s in sizes], label_type='edge')
-    st.pyplot(fig)
+    bar_chart(['Correct', 'Incorrect'], [likelyhood, 1 - likelyhood], ['green', 'red'], 'Probability of Correct Classification')
 
     if st.button("Show less", key=f"show_less_{data['title']}"):
-        st.session_state["data_breakdown"] = False
\ No newline at end of file
+        st.session_state["data_breakdown"] = False
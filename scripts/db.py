@@ -1,11 +1,190 @@
 import sqlite3
 import streamlit as st
+import pandas as pd
 import os
+import sys
+import zlib
+import hashlib
+import argparse
+import atexit
+import logging
+import threading
+import time
+import functools
+from collections import OrderedDict
+from concurrent.futures import Future
+from metrics import instrument
+
+logger = logging.getLogger(__name__)
 
 standard_db_path = "articles.db"
+content_compression_level = int(os.getenv("CONTENT_COMPRESSION_LEVEL", "6"))
+
+
+def compress_content(text):
+    """Compress article content for storage. Texts that do not shrink are stored as they are."""
+    if not isinstance(text, str):
+        return text
+    data = text.encode("utf-8")
+    compressed = zlib.compress(data, content_compression_level)
+    return compressed if len(compressed) < len(data) else text
+
+
+def decompress_content(value):
+    """Return stored article content as text, whether it was compressed or not."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
+
+
+def _decompress_rows(rows, index):
+    return [row[:index] + (decompress_content(row[index]),) + row[index + 1:] for row in rows]
+
+
+# Process-wide cache for read queries. Every write path bumps the data version,
+# so readers share one cached result until the data changes. The TTL is a
+# fallback for writes made by other processes sharing the same database file.
+query_cache_ttl = float(os.getenv("QUERY_CACHE_TTL", "60"))
+query_cache_size = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+_cache_lock = threading.Lock()
+_data_version = 0
+_query_cache = OrderedDict()
+_query_locks = {}
+
+
+def _drop_idle_query_locks():
+    for key, lock in list(_query_locks.items()):
+        if key not in _query_cache and not lock.locked():
+            del _query_locks[key]
+
+
+def bump_data_version():
+    """Invalidate cached query results after a write."""
+    global _data_version
+    with _cache_lock:
+        _data_version += 1
+        # Every cached result is stale now
+        _query_cache.clear()
+        _drop_idle_query_locks()
+        return _data_version
+
+
+def get_data_version():
+    """Return the current data version counter."""
+    return _data_version
+
+
+def clear_query_cache():
+    """Drop all cached query results."""
+    with _cache_lock:
+        _query_cache.clear()
+        _query_locks.clear()
+
+
+def cached_query(func):
+    """
+    Cache the result of a read query until the data version changes or the TTL expires.
+    Concurrent callers missing the same key wait for a single query instead of
+    each hitting the database. At most query_cache_size results are kept, least
+    recently used ones are evicted first.
+    """
+    def lookup(key):
+        entry = _query_cache.get(key)
+        if entry is not None:
+            version, stored_at, rows = entry
+            if version == _data_version and time.monotonic() - stored_at < query_cache_ttl:
+                _query_cache.move_to_end(key)
+                return rows
+        return None
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = (func.__name__, args, tuple(sorted(kwargs.items())))
+        with _cache_lock:
+            rows = lookup(key)
+            if rows is not None:
+                return list(rows)
+            key_lock = _query_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # Another caller may have refreshed the entry while we waited
+            with _cache_lock:
+                rows = lookup(key)
+                version = _data_version
+            if rows is None:
+                rows = func(*args, **kwargs)
+                with _cache_lock:
+                    _query_cache[key] = (version, time.monotonic(), rows)
+                    _query_cache.move_to_end(key)
+                    if len(_query_cache) > query_cache_size:
+                        evicted, _ = _query_cache.popitem(last=False)
+                        evicted_lock = _query_locks.get(evicted)
+                        if evicted_lock is not None and not evicted_lock.locked():
+                            del _query_locks[evicted]
+        return list(rows)
+
+    return wrapper
+
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+def _migration_1(c):
+    """Indexes for the join and lookup columns, plus a trigger-maintained popularity counter."""
+    columns = {row[1] for row in c.execute("PRAGMA table_info(articles)")}
+    if "user_count" not in columns:
+        c.execute("ALTER TABLE articles ADD COLUMN user_count INTEGER NOT NULL DEFAULT 0")
+
+    c.execute("CREATE INDEX IF NOT EXISTS idx_user_articles_article ON user_articles (article_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_reports_article ON reports (article_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_articles_popularity ON articles (user_count DESC, id)")
+
+    # Counting links per article at read time needs a temp B-tree to sort by the aggregate
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS user_articles_count_insert AFTER INSERT ON user_articles
+        BEGIN
+            UPDATE articles SET user_count = user_count + 1 WHERE id = NEW.article_id;
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS user_articles_count_delete AFTER DELETE ON user_articles
+        BEGIN
+            UPDATE articles SET user_count = user_count - 1 WHERE id = OLD.article_id;
+        END
+    ''')
+    c.execute('''
+        UPDATE articles
+        SET user_count = (SELECT COUNT(*) FROM user_articles ua WHERE ua.article_id = articles.id)
+    ''')
+
+
+def _migration_2(c):
+    """Compressed article content and a key/value table for database metadata."""
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS db_metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+    ''')
+    rows = c.execute("SELECT id, content FROM articles WHERE typeof(content) = 'text'").fetchall()
+    c.executemany("UPDATE articles SET content = ? WHERE id = ?",
+                  ((compress_content(content), article_id) for article_id, content in rows))
+
+
+migrations = [_migration_1, _migration_2]
+
+
+def migrate_db(conn):
+    """Apply pending schema migrations to an open connection."""
+    c = conn.cursor()
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(migrations[version:], start=version + 1):
+        migration(c)
+        c.execute(f"PRAGMA user_version = {number}")
+    conn.commit()
+
 
 # Initialize SQLite database connection
 @st.cache_resource
+@instrument
 def init_db(csv_data, db_path=None):
     """Initialize the SQLite database without wiping existing user data."""
     db_path = db_path or os.getenv("DB_PATH", standard_db_path)
@@ -56,51 +235,61 @@ def init_db(csv_data, db_path=None):
         )
     ''')
 
-    # Insert articles into the database
-    c.execute("DELETE FROM articles")  # Clear articles only
-    for _, row in csv_data.iterrows():
-        c.execute("INSERT INTO articles (title, content, label, confidence) VALUES (?, ?, ?, ?)",
-                  (row['title'], row['content'], row['label'], row.get('confidence', 0.0)))
+    migrate_db(conn)
 
     # Ensure guest user exists
     c.execute("SELECT id FROM users WHERE username = 'guest'")
     guest_exists = c.fetchone()
     if not guest_exists:
         c.execute("INSERT INTO users (username, password, user_type) VALUES ('guest', 'guest', 'normal')")
-
-    # Link guest user to all articles
     guest_user_id = c.execute("SELECT id FROM users WHERE username = 'guest'").fetchone()[0]
-    c.execute("SELECT id FROM articles")
-    article_ids = c.fetchall()
-    for article_id in article_ids:
-        c.execute("INSERT OR IGNORE INTO user_articles (user_id, article_id) VALUES (?, ?)",
-                  (guest_user_id, article_id[0]))
+
+    # Insert articles into the database, unless the seed data is unchanged since the last start
+    seed_hash = hashlib.sha1(pd.util.hash_pandas_object(csv_data, index=False).values.tobytes()).hexdigest()
+    stored_hash = c.execute("SELECT value FROM db_metadata WHERE key = 'seed_hash'").fetchone()
+    if stored_hash is None or stored_hash[0] != seed_hash:
+        c.execute("DELETE FROM articles")  # Clear articles only
+        confidence = csv_data['confidence'] if 'confidence' in csv_data else [0.0] * len(csv_data)
+        c.executemany("INSERT INTO articles (title, content, label, confidence) VALUES (?, ?, ?, ?)",
+                      zip(csv_data['title'], map(compress_content, csv_data['content']), csv_data['label'], confidence))
+        c.execute("INSERT OR REPLACE INTO db_metadata (key, value) VALUES ('seed_hash', ?)", (seed_hash,))
+
+        # Link guest user to the seeded articles, submissions kept across restarts stay with their users
+        c.execute("INSERT OR IGNORE INTO user_articles (user_id, article_id) SELECT ?, id FROM articles",
+                  (guest_user_id,))
 
     conn.commit()
     conn.close()
+    bump_data_version()
 
 # Other functions (examples):
+@instrument
 def insert_article(title, content, label, confidence=1.0, db_path=None):
     db_path = db_path or os.getenv("DB_PATH", standard_db_path)
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     c.execute("INSERT INTO articles (title, content, label, confidence) VALUES (?, ?, ?, ?)",
-              (title, content, label, float(confidence)))
+              (title, compress_content(content), label, float(confidence)))
     article_id = c.lastrowid
     conn.commit()
     conn.close()
+    bump_data_version()
     return article_id
 
+@instrument
+@cached_query
 def fetch_articles(limit=10, db_path=None):
     db_path = db_path or os.getenv("DB_PATH", standard_db_path)
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     c.execute("SELECT id, title, content, label, confidence FROM articles ORDER BY id DESC LIMIT ?", (limit,))
-    rows = c.fetchall()
+    rows = _decompress_rows(c.fetchall(), 2)
     conn.close()
     return rows
 
 
+@instrument
+@cached_query
 def fetch_popular_articles(limit=5):
     """
     Fetch the most popular articles based on the number of users linked to each article.
@@ -109,21 +298,21 @@ def fetch_popular_articles(limit=5):
     conn = sqlite3.connect("articles.db")
     c = conn.cursor()
 
-    # Query to fetch articles with user count and confidence
+    # user_count is kept up to date by triggers, so this walks idx_articles_popularity
     c.execute('''
-        SELECT a.id, a.title, a.content, a.label, a.confidence, COUNT(ua.user_id) as user_count
-        FROM articles a
-        LEFT JOIN user_articles ua ON a.id = ua.article_id
-        GROUP BY a.id
-        ORDER BY user_count DESC, a.id ASC
+        SELECT id, title, content, label, confidence, user_count
+        FROM articles
+        ORDER BY user_count DESC, id ASC
         LIMIT ?
     ''', (limit,))
 
-    articles = c.fetchall()
+    articles = _decompress_rows(c.fetchall(), 2)
     conn.close()
     return articles
 
 
+@instrument
+@cached_query
 def fetch_recent_articles(limit=5):
     """
     Fetch the most recent articles based on the highest primary key (id).
@@ -134,11 +323,12 @@ def fetch_recent_articles(limit=5):
 
     # Fetch articles ordered by 'id' in descending order with confidence
     c.execute("SELECT id, title, content, label, confidence FROM articles ORDER BY id DESC LIMIT ?", (limit,))
-    rows = c.fetchall()
+    rows = _decompress_rows(c.fetchall(), 2)
     conn.close()
     return rows
 
 
+@instrument
 def fetch_random_articles(limit=5):
     """
     Fetch random articles from the database.
@@ -149,11 +339,35 @@ def fetch_random_articles(limit=5):
 
     # Use SQL's RANDOM() to fetch random rows with confidence
     c.execute("SELECT id, title, content, label, confidence FROM articles ORDER BY RANDOM() LIMIT ?", (limit,))
-    rows = c.fetchall()
+    rows = _decompress_rows(c.fetchall(), 2)
     conn.close()
     return rows
 
 
+@instrument
+def fetch_article(article_id):
+    """Fetch a single article's label and content."""
+    conn = sqlite3.connect("articles.db")
+    c = conn.cursor()
+    c.execute("SELECT label, content FROM articles WHERE id = ?", (article_id,))
+    article = c.fetchone()
+    conn.close()
+    if article is None:
+        return None
+    return article[0], decompress_content(article[1])
+
+
+@instrument
+def get_guest_user_id():
+    """Return the ID of the shared guest user."""
+    conn = sqlite3.connect("articles.db")
+    c = conn.cursor()
+    guest_user_id = c.execute("SELECT id FROM users WHERE username = 'guest'").fetchone()[0]
+    conn.close()
+    return guest_user_id
+
+
+@instrument
 def register_user(username, password, user_type='normal'):
     """Register a new user."""
     conn = sqlite3.connect("articles.db")
@@ -174,6 +388,7 @@ def register_user(username, password, user_type='normal'):
         conn.close()
 
 
+@instrument
 def authenticate_user(username, password):
     """Authenticate a user by username and password."""
     conn = sqlite3.connect("articles.db")
@@ -196,15 +411,20 @@ def authenticate_user(username, password):
 #         conn.commit()
 #     finally:
 #         conn.close()
-def add_user_article_relation(user_id, article_id):
-    conn = sqlite3.connect("articles.db")
+@instrument
+def add_user_article_relation(user_id, article_id, db_path=None):
+    db_path = db_path or os.getenv("DB_PATH", standard_db_path)
+    conn = sqlite3.connect(db_path)
     c = conn.cursor()
     c.execute("INSERT OR IGNORE INTO user_articles (user_id, article_id) VALUES (?, ?)", (user_id, article_id))
     conn.commit()
     conn.close()
+    bump_data_version()
 
 
 
+@instrument
+@cached_query
 def fetch_articles_for_user(user_id):
     """Fetch all articles linked to a specific user."""
     conn = sqlite3.connect("articles.db")
@@ -216,12 +436,13 @@ def fetch_articles_for_user(user_id):
         INNER JOIN user_articles ua ON a.id = ua.article_id
         WHERE ua.user_id = ?
     ''', (user_id,))
-    
-    articles = c.fetchall()
+
+    articles = _decompress_rows(c.fetchall(), 2)
     conn.close()
     return articles
 
 
+@instrument
 def add_report(user_id, article_id, report_content):
     """Add a report to the reports table."""
     conn = sqlite3.connect("articles.db")
@@ -237,7 +458,10 @@ def add_report(user_id, article_id, report_content):
         print("Report already exists for this user and article.")
     finally:
         conn.close()
+    bump_data_version()
 
+@instrument
+@cached_query
 def fetch_all_reports():
     """Fetch all reports from the database."""
     conn = sqlite3.connect("articles.db")
@@ -252,6 +476,7 @@ def fetch_all_reports():
     return reports
 
 
+@instrument
 def delete_report(user_id, article_id):
     """Delete a report from the database."""
     conn = sqlite3.connect("articles.db")
@@ -260,7 +485,9 @@ def delete_report(user_id, article_id):
               (user_id, article_id))
     conn.commit()
     conn.close()
+    bump_data_version()
 
+@instrument
 def delete_article(article_id):
     """Delete an article from the database and its reports."""
     conn = sqlite3.connect("articles.db")
@@ -269,7 +496,9 @@ def delete_article(article_id):
     c.execute("DELETE FROM reports WHERE article_id = ?", (article_id,))
     conn.commit()
     conn.close()
+    bump_data_version()
 
+@instrument
 def toggle_article_label(article_id):
     """Toggle the label of an article between FAKE and REAL."""
     conn = sqlite3.connect("articles.db")
@@ -281,4 +510,262 @@ def toggle_article_label(article_id):
     c.execute("UPDATE articles SET label = ? WHERE id = ?", (new_label, article_id))
     conn.commit()
     conn.close()
+    bump_data_version()
     return new_label  # Return the new label
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that groups article inserts and user links into one transaction.
+    A background thread commits the pending writes once max_batch of them are queued or the
+    oldest has waited max_delay seconds, so a burst of submissions costs one sync instead
+    of one per row. With max_delay=0 a batch is whatever arrived during the previous commit.
+    Callers get a Future per write; article inserts resolve to the new id. A failed write
+    only fails its own future, and writes cancelled before their batch starts are skipped.
+    """
+
+    def __init__(self, db_path=None, max_batch=100, max_delay=0.0):
+        self.db_path = db_path or os.getenv("DB_PATH", standard_db_path)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self._pending = []
+        self._oldest = None
+        self._writing = False
+        self._flushing = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._work, name="db-write-buffer", daemon=True)
+        self._thread.start()
+
+    def insert_article(self, title, content, label, confidence=1.0, user_id=None):
+        """Queue an article insert, linked to user_id in the same transaction when given. Resolves to the article id."""
+        return self._submit(("article", (title, compress_content(content), label, float(confidence)), user_id))
+
+    def add_user_article_relation(self, user_id, article_id):
+        """Queue a user link to an existing article. Resolves to None."""
+        return self._submit(("link", (user_id, article_id), None))
+
+    def flush(self, timeout=None):
+        """Write everything queued so far. Returns False on timeout."""
+        with self._cond:
+            self._flushing = bool(self._pending)
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def close(self, timeout=30.0):
+        """Flush queued writes and stop the writer thread. Later writes are rejected."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Database write buffer was not fully flushed at shutdown")
+
+    def _submit(self, write):
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write buffer is closed")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((write, future))
+            if len(self._pending) in (1, self.max_batch):
+                self._cond.notify_all()  # Start the delay timer, or write a full batch now
+        return future
+
+    def _due(self):
+        return (self._closed or self._flushing or len(self._pending) >= self.max_batch
+                or (self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay))
+
+    def _work(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None)  # Transactions are managed explicitly
+        try:
+            while True:
+                with self._cond:
+                    while not (self._pending and self._due()):
+                        if self._closed:
+                            return
+                        wait = None if not self._pending else self._oldest + self.max_delay - time.monotonic()
+                        self._cond.wait(wait)
+                    batch, self._pending, self._oldest = self._pending, [], None
+                    self._writing, self._flushing = True, False
+                try:
+                    # Cancelled writes are skipped, the rest can no longer be cancelled
+                    batch = [(write, future) for write, future in batch if future.set_running_or_notify_cancel()]
+                    if batch:
+                        self._write_batch(conn, batch)
+                except Exception as e:
+                    # Keep the writer alive, later batches may succeed
+                    logger.exception("Database write batch failed")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                finally:
+                    with self._cond:
+                        self._writing = False
+                        self._cond.notify_all()
+        finally:
+            conn.close()
+
+    @instrument
+    def _write_batch(self, conn, batch):
+        # Each write gets its own savepoint, so a bad row fails only its own future
+        c = conn.cursor()
+        outcomes = []
+        c.execute("BEGIN")
+        try:
+            for (kind, values, user_id), _ in batch:
+                c.execute("SAVEPOINT buffered_write")
+                try:
+                    if kind == "article":
+                        c.execute("INSERT INTO articles (title, content, label, confidence) VALUES (?, ?, ?, ?)", values)
+                        result = c.lastrowid
+                        if user_id is not None:
+                            c.execute("INSERT OR IGNORE INTO user_articles (user_id, article_id) VALUES (?, ?)",
+                                      (user_id, result))
+                    else:
+                        c.execute("INSERT OR IGNORE INTO user_articles (user_id, article_id) VALUES (?, ?)", values)
+                        result = None
+                except sqlite3.Error as e:
+                    c.execute("ROLLBACK TO buffered_write")
+                    logger.error("Buffered database write failed: %s", e)
+                    outcomes.append((False, e))
+                else:
+                    outcomes.append((True, result))
+                c.execute("RELEASE buffered_write")
+            c.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                c.execute("ROLLBACK")
+            raise
+        self.batches += 1
+        bump_data_version()
+        for (_, future), (succeeded, outcome) in zip(batch, outcomes):
+            if succeeded:
+                future.set_result(outcome)
+            else:
+                future.set_exception(outcome)
+
+
+_write_buffer = None
+_write_buffer_lock = threading.Lock()
+
+
+def get_write_buffer():
+    """
+    Return the process-wide write buffer when DB_WRITE_BUFFER=1, otherwise None.
+    Batch size and delay come from DB_WRITE_BATCH and DB_WRITE_DELAY_MS.
+    """
+    global _write_buffer
+    if os.getenv("DB_WRITE_BUFFER", "0") != "1":
+        return None
+    with _write_buffer_lock:
+        if _write_buffer is None:
+            _write_buffer = WriteBuffer(
+                max_batch=int(os.getenv("DB_WRITE_BATCH", "100")),
+                max_delay=float(os.getenv("DB_WRITE_DELAY_MS", "0")) / 1000,
+            )
+            atexit.register(_write_buffer.close)
+        return _write_buffer
+
+
+def measure_read_latency(db_path=None, sample=1000):
+    """Average seconds to read and decompress one article's content by id."""
+    db_path = db_path or os.getenv("DB_PATH", standard_db_path)
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    ids = [row[0] for row in c.execute("SELECT id FROM articles ORDER BY id LIMIT ?", (sample,))]
+    start = time.perf_counter()
+    for article_id in ids:
+        decompress_content(c.execute("SELECT content FROM articles WHERE id = ?", (article_id,)).fetchone()[0])
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed / len(ids) if ids else 0.0
+
+
+@instrument
+def compact_db(db_path=None):
+    """
+    Remove duplicate articles and orphaned user_articles and reports rows, then VACUUM and ANALYZE.
+    Links and reports of a duplicate move to the oldest copy of the article.
+    Returns counts of removed rows and the file size before and after.
+    """
+    db_path = db_path or os.getenv("DB_PATH", standard_db_path)
+    size_before = os.path.getsize(db_path)
+    conn = sqlite3.connect(db_path)
+    migrate_db(conn)
+    c = conn.cursor()
+
+    # Compare decompressed text, the same content compressed at another level differs byte for byte
+    conn.create_function("content_hash", 1, lambda value: hashlib.sha1(decompress_content(value).encode("utf-8")).digest(),
+                         deterministic=True)
+    c.execute("CREATE TEMP TABLE article_keys AS SELECT id, title, label, content_hash(content) AS content_hash FROM articles")
+    c.execute('''
+        CREATE TEMP TABLE duplicates AS
+        SELECT a.id AS duplicate_id, k.keep_id
+        FROM article_keys a
+        INNER JOIN (
+            SELECT MIN(id) AS keep_id, title, content_hash, label
+            FROM article_keys
+            GROUP BY title, content_hash, label
+            HAVING COUNT(*) > 1
+        ) k ON a.title = k.title AND a.content_hash = k.content_hash AND a.label = k.label
+        WHERE a.id != k.keep_id
+    ''')
+    c.execute('''
+        INSERT OR IGNORE INTO user_articles (user_id, article_id)
+        SELECT ua.user_id, d.keep_id FROM user_articles ua INNER JOIN duplicates d ON ua.article_id = d.duplicate_id
+    ''')
+    c.execute('''
+        INSERT OR IGNORE INTO reports (user_id, article_id, report_content)
+        SELECT r.user_id, d.keep_id, r.report_content FROM reports r INNER JOIN duplicates d ON r.article_id = d.duplicate_id
+    ''')
+    c.execute("DELETE FROM user_articles WHERE article_id IN (SELECT duplicate_id FROM duplicates)")
+    c.execute("DELETE FROM reports WHERE article_id IN (SELECT duplicate_id FROM duplicates)")
+    duplicates = c.execute("DELETE FROM articles WHERE id IN (SELECT duplicate_id FROM duplicates)").rowcount
+
+    orphaned_links = c.execute('''
+        DELETE FROM user_articles
+        WHERE article_id NOT IN (SELECT id FROM articles) OR user_id NOT IN (SELECT id FROM users)
+    ''').rowcount
+    orphaned_reports = c.execute('''
+        DELETE FROM reports
+        WHERE article_id NOT IN (SELECT id FROM articles) OR user_id NOT IN (SELECT id FROM users)
+    ''').rowcount
+    c.execute("DROP TABLE duplicates")
+    c.execute("DROP TABLE article_keys")
+    conn.commit()
+
+    c.execute("VACUUM")
+    c.execute("ANALYZE")
+    conn.close()
+    bump_data_version()
+
+    return {
+        "duplicate_articles": duplicates,
+        "orphaned_user_articles": orphaned_links,
+        "orphaned_reports": orphaned_reports,
+        "size_before": size_before,
+        "size_after": os.path.getsize(db_path),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance commands for the articles database.")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--db", default=None, help="Database path (default: DB_PATH or articles.db)")
+    args = parser.parse_args(argv)
+
+    latency_before = measure_read_latency(args.db)
+    stats = compact_db(args.db)
+    latency_after = measure_read_latency(args.db)
+
+    print(f"Removed {stats['duplicate_articles']} duplicate articles, "
+          f"{stats['orphaned_user_articles']} orphaned user links and {stats['orphaned_reports']} orphaned reports")
+    print(f"Size: {stats['size_before'] / 1024:.1f} kB -> {stats['size_after'] / 1024:.1f} kB")
+    print(f"Read latency per article: {latency_before * 1e6:.1f} us -> {latency_after * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
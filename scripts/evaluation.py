@@ -0,0 +1,120 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import StratifiedKFold
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from metrics import instrument
+from backends import get_backend
+from utils import prepare_texts
+from tracking import get_run_logger
+
+labels = ["FAKE", "REAL"]
+
+# Fold indices and vectorized folds, keyed by dataset hash and split settings
+fold_cache_size = int(os.getenv("FOLD_CACHE_SIZE", "4"))
+_fold_cache = OrderedDict()
+_fold_cache_lock = threading.Lock()
+
+
+def dataset_hash(texts, y):
+    """Hash the texts and labels of a dataset so identical corpora share cached folds."""
+    digest = hashlib.sha1()
+    digest.update(pd.util.hash_pandas_object(pd.Series(texts), index=False).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(pd.Series(y), index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def fold_metrics(y_true, y_pred):
+    """Compute every evaluation metric from a single set of predictions."""
+    report = classification_report(y_true, y_pred, labels=labels, output_dict=True, zero_division=0)
+    return {
+        "accuracy": accuracy_score(y_true, y_pred),
+        "precision_fake": report["FAKE"]["precision"],
+        "recall_fake": report["FAKE"]["recall"],
+        "precision_real": report["REAL"]["precision"],
+        "recall_real": report["REAL"]["recall"],
+        "confusion": confusion_matrix(y_true, y_pred, labels=labels),
+    }
+
+
+def _vectorize_fold(backend, texts, train_idx, test_idx):
+    # Fit on the training part only so the test fold's vocabulary does not leak
+    vectorizer = backend.make_vectorizer()
+    vectorizer.set_params(n_jobs=1)  # Folds already run one per worker process
+    return vectorizer.fit_transform(texts[train_idx]), vectorizer.transform(texts[test_idx])
+
+
+def _score_fold(backend, x_train, y_train, x_test, y_test):
+    model = backend.make_classifier()
+    model.fit(x_train, y_train)
+    return fold_metrics(y_test, model.predict(x_test))
+
+
+def _cached_folds(key):
+    with _fold_cache_lock:
+        folds = _fold_cache.get(key)
+        if folds is not None:
+            _fold_cache.move_to_end(key)
+        return folds
+
+
+def _store_folds(key, folds):
+    with _fold_cache_lock:
+        _fold_cache[key] = folds
+        while len(_fold_cache) > fold_cache_size:
+            _fold_cache.popitem(last=False)
+
+
+def clear_fold_cache():
+    """Drop all cached folds."""
+    with _fold_cache_lock:
+        _fold_cache.clear()
+
+
+@instrument
+def cross_validate_model(data, n_splits=5, alpha=1.0, backend=None, n_jobs=None, random_state=42, log_to_mlflow=True):
+    """
+    Runs stratified k-fold evaluation across a process pool and returns averaged metrics.
+    Fold indices and vectorized folds are cached by dataset hash, so re-evaluating the same
+    corpus with different model parameters skips splitting and vectorization.
+    No model or vectorizer artifacts are written.
+    """
+    texts = np.asarray(prepare_texts(data), dtype=object)
+    y = np.asarray(data['label'])
+    backend = get_backend(backend, alpha=alpha)
+    key = (dataset_hash(texts, y), backend.vectorizer_key(), n_splits, random_state)
+    workers = n_jobs or min(n_splits, os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        folds = _cached_folds(key)
+        if folds is None:
+            splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+            indices = list(splitter.split(texts, y))
+            futures = [pool.submit(_vectorize_fold, backend, texts, train_idx, test_idx) for train_idx, test_idx in indices]
+            folds = []
+            for (train_idx, test_idx), future in zip(indices, futures):
+                x_train, x_test = future.result()
+                folds.append((x_train, y[train_idx], x_test, y[test_idx]))
+            _store_folds(key, folds)
+
+        futures = [pool.submit(_score_fold, backend, x_train, y_train, x_test, y_test) for x_train, y_train, x_test, y_test in folds]
+        results = [future.result() for future in futures]
+
+    summary = {
+        name: float(np.mean([result[name] for result in results]))
+        for name in ("accuracy", "precision_fake", "recall_fake", "precision_real", "recall_real")
+    }
+    summary["accuracy_std"] = float(np.std([result["accuracy"] for result in results]))
+    summary["confusion"] = sum(result["confusion"] for result in results)
+
+    if log_to_mlflow:
+        get_run_logger().log_run(
+            params={"evaluation": "cross_validation", "n_splits": n_splits, **backend.mlflow_params()},
+            metrics={f"cv_{name}": value for name, value in summary.items() if name != "confusion"},
+        )
+
+    return summary
@@ -0,0 +1,140 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import functools
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds in seconds (Prometheus style)
+latency_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+enabled = os.getenv("METRICS_ENABLED", "1") != "0"
+slow_call_threshold = float(os.getenv("METRICS_SLOW_MS", "500")) / 1000
+slow_call_thresholds = {}  # Per-function overrides in seconds, e.g. {"model.train_model": 30.0}
+
+_lock = threading.Lock()
+_stats = {}
+
+
+class _CallStats:
+    """Counters and a latency histogram for one instrumented function."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.slow = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(latency_buckets) + 1)  # Last bucket is +Inf
+
+    def record(self, elapsed, failed, slow):
+        self.count += 1
+        self.errors += failed
+        self.slow += slow
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.buckets[bisect.bisect_left(latency_buckets, elapsed)] += 1
+
+
+def set_enabled(value):
+    """Turn metric collection on or off at runtime."""
+    global enabled
+    enabled = bool(value)
+
+
+def set_slow_call_threshold(name, seconds):
+    """Override the slow-call threshold for one function, e.g. "db.fetch_all_reports"."""
+    slow_call_thresholds[name] = seconds
+
+
+def reset():
+    """Drop all collected metrics."""
+    with _lock:
+        _stats.clear()
+
+
+def instrument(func):
+    """
+    Record call counts, errors and latency for a function and log calls slower than the threshold.
+    When metrics are disabled the wrapper only checks a flag before calling through.
+    """
+    name = f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not enabled:
+            return func(*args, **kwargs)
+
+        failed = True
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            slow = elapsed >= slow_call_thresholds.get(name, slow_call_threshold)
+            if slow:
+                logger.warning("Slow call: %s took %.1f ms", name, elapsed * 1000)
+            with _lock:
+                stats = _stats.get(name)
+                if stats is None:
+                    stats = _stats[name] = _CallStats()
+                stats.record(elapsed, failed, slow)
+
+    return wrapper
+
+
+def snapshot():
+    """Return a JSON-serializable copy of all collected metrics."""
+    with _lock:
+        items = sorted(_stats.items())
+        return {
+            name: {
+                "count": stats.count,
+                "errors": stats.errors,
+                "slow": stats.slow,
+                "total_seconds": stats.total,
+                "mean_seconds": stats.total / stats.count if stats.count else 0.0,
+                "max_seconds": stats.max,
+                "buckets": {
+                    **{str(bound): count for bound, count in zip(latency_buckets, stats.buckets)},
+                    "+Inf": stats.buckets[-1],
+                },
+            }
+            for name, stats in items
+        }
+
+
+def to_json():
+    """Export the metrics snapshot as JSON."""
+    return json.dumps(snapshot(), indent=2)
+
+
+def to_prometheus():
+    """Export the metrics snapshot in the Prometheus text exposition format."""
+    lines = [
+        "# HELP app_call_duration_seconds Latency of instrumented calls.",
+        "# TYPE app_call_duration_seconds histogram",
+    ]
+    data = snapshot()
+    for name, stats in data.items():
+        cumulative = 0
+        for bound, count in stats["buckets"].items():
+            cumulative += count
+            lines.append(f'app_call_duration_seconds_bucket{{function="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'app_call_duration_seconds_sum{{function="{name}"}} {stats["total_seconds"]}')
+        lines.append(f'app_call_duration_seconds_count{{function="{name}"}} {stats["count"]}')
+
+    for metric, key, help_text in (
+        ("app_call_errors_total", "errors", "Instrumented calls that raised an exception."),
+        ("app_slow_calls_total", "slow", "Instrumented calls slower than their threshold."),
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for name, stats in data.items():
+            lines.append(f'{metric}{{function="{name}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
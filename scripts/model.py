@@ -1,64 +1,62 @@
 import os
-import pickle
+import functools
 import numpy as np
-from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.model_selection import train_test_split
-from sklearn.naive_bayes import MultinomialNB
-from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
-import mlflow
-import mlflow.sklearn
-import pickle
+from sklearn.metrics import accuracy_score, classification_report
 import streamlit as st
+from metrics import instrument
+from evaluation import fold_metrics
+from backends import get_backend
+from utils import clean_text, prepare_texts
+from tracking import get_run_logger
+from registry import publish_model, version_path
+from compact import CompactModel
 
-script_dir = os.path.dirname(__file__)
-default_model_path = os.path.join(script_dir, "..", "models", "model.pkl")
-default_vectorizer_path = os.path.join(script_dir, "..", "models", "vectorizer.pkl")
+keep_model_versions = int(os.getenv("KEEP_MODEL_VERSIONS", "10"))
+compact_model_dtype = os.getenv("COMPACT_MODEL_DTYPE", "float32")
 
 @st.cache_resource
-def train_model(data, model_path=None, vectorizer_path=None, alpha=1.0):
-    # Use the provided paths or fall back to the defaults
-    model_path = model_path or default_model_path
-    vectorizer_path = vectorizer_path or default_vectorizer_path
-
-    # Combine title and content
-    data['combined'] = data['title'] + " " + data['content']
+@instrument
+def train_model(data, registry_dir=None, alpha=1.0, backend=None):
+    # Combine title and content and normalize them
+    data['combined'] = prepare_texts(data)
     x = np.array(data['combined'])
     y = np.array(data['label'])
 
     # Vectorize text
-    vectorizer = CountVectorizer()
+    backend = get_backend(backend, alpha=alpha)
+    vectorizer = backend.make_vectorizer()
     x = vectorizer.fit_transform(x)
 
     # Train-test split
     x_train, x_test, y_train, y_test = train_test_split(x, y, test_size=0.2, random_state=42)
 
     # Train model
-    model = MultinomialNB()
+    model = backend.make_classifier()
     model.fit(x_train, y_train)
 
-    # Calculate accuracy on the test set
+    # Calculate accuracy on the test set from a single prediction pass
     y_pred = model.predict(x_test)
     accuracy = accuracy_score(y_test, y_pred)
     train_acc = model.score(x_train, y_train)
-    test_acc = model.score(x_test, y_test)
-
-    # Save the vectorizer
-    with open(vectorizer_path, "wb") as f:
-        pickle.dump(vectorizer, f)
-
-    # Save the model
-    with open(model_path, "wb") as f:
-        pickle.dump(model, f)
-
-    # Log to MLflow
-    with mlflow.start_run():
-        mlflow.log_param("model_type", "MultinomialNB")
-        mlflow.log_param("vectorizer", "CountVectorizer")
-        mlflow.log_param("alpha", alpha)
-        mlflow.log_metric("train_accuracy", train_acc)
-        mlflow.log_metric("test_accuracy", test_acc)
-        mlflow.log_artifact(vectorizer_path, artifact_path="preprocessing")
-        mlflow.log_artifact(model_path, artifact_path="model")
+    test_acc = accuracy
+
+    # Publish the model and vectorizer together as a new version, serving processes pick it up.
+    # Predictions and explanations are served from the compact form, the full model is still published alongside it
+    metrics = {"train_accuracy": train_acc, "test_accuracy": test_acc}
+    version = publish_model(
+        model, vectorizer, metadata={"accuracy": accuracy, **metrics, **backend.mlflow_params()},
+        registry_dir=registry_dir, keep=keep_model_versions,
+        compact=CompactModel.from_estimator(model, vectorizer, dtype=compact_model_dtype)
+    )
+    path = version_path(version, registry_dir)
+
+    # Log to MLflow in the background so startup does not wait on the tracking store
+    get_run_logger().log_run(
+        params={**backend.mlflow_params(), "model_version": version},
+        metrics=metrics,
+        artifacts=[(os.path.join(path, "vectorizer.pkl"), "preprocessing"), (os.path.join(path, "model.pkl"), "model")],
+    )
 
     print(f"Train Accuracy: {train_acc}")
     print(f"Test Accuracy: {test_acc}")
@@ -66,43 +64,71 @@ def train_model(data, model_path=None, vectorizer_path=None, alpha=1.0):
     # Return model, vectorizer, and accuracy
     return model, vectorizer, accuracy
 
-def predict(model, vectorizer, text):
-    transformed_text = vectorizer.transform([text]).toarray()
+@instrument
+def predict(model, vectorizer, text, compact=None):
+    if compact is not None:
+        return compact.predict(text)
+    transformed_text = vectorizer.transform([clean_text(text)])
     return model.predict(transformed_text)[0]
 
-def evaluate_model(model, vectorizer, x_test, y_test, model_path=None, vectorizer_path=None):
+@functools.lru_cache(maxsize=4)
+def _feature_names(vectorizer):
+    # Built once per fitted vectorizer instead of once per explanation
+    return vectorizer.get_feature_names_out()
+
+@instrument
+def explain_prediction(model, vectorizer, text, top_n=10, compact=None):
+    """
+    Returns the tokens that contributed most to the prediction as (token, weight) pairs.
+    Positive weights push towards FAKE, negative weights towards REAL.
+    Only the nonzero entries of the document's sparse row are visited, so the cost is O(nnz).
+    """
+    if compact is not None:
+        return compact.explain(text, top_n)
+    row = vectorizer.transform([clean_text(text)])
+    indices, counts = row.indices, row.data
+
+    classes = list(model.classes_)
+    if hasattr(model, "feature_log_prob_"):
+        log_prob = model.feature_log_prob_
+        weights = counts * (log_prob[classes.index("FAKE"), indices] - log_prob[classes.index("REAL"), indices])
+    else:
+        # Binary linear models score classes_[1] with a positive decision function
+        sign = 1 if classes[1] == "FAKE" else -1
+        weights = counts * sign * model.coef_[0, indices]
+
+    top = np.argsort(-np.abs(weights), kind="stable")[:top_n]
+    names = _feature_names(vectorizer)
+    return [(str(names[indices[i]]), float(weights[i])) for i in top]
+
+@instrument
+def evaluate_model(model, vectorizer, x_test, y_test, log_to_mlflow=True):
     """
     Evaluates the model on test data and logs evaluation metrics to MLflow.
+    All metrics come from a single prediction pass and no artifacts are rewritten.
+    Metrics are logged into the active MLflow run when there is one.
     """
-    # Use the provided paths or fall back to the defaults
-    model_path = model_path or default_model_path
-    vectorizer_path = vectorizer_path or default_vectorizer_path
-
     # Predictions
     predictions = model.predict(x_test)
 
     # Calculate metrics
-    acc = accuracy_score(y_test, predictions)
+    scores = fold_metrics(y_test, predictions)
+    acc = scores["accuracy"]
     report = classification_report(y_test, predictions, output_dict=True)
-    confusion = confusion_matrix(y_test, predictions)
-
-    # Save the vectorizer and model again after evaluation (if updated paths are provided)
-    with open(vectorizer_path, "wb") as f:
-        pickle.dump(vectorizer, f)
-
-    with open(model_path, "wb") as f:
-        pickle.dump(model, f)
+    confusion = scores["confusion"]
 
     # Log evaluation metrics to MLflow
-    with mlflow.start_run():
-        mlflow.log_metric("evaluation_accuracy", acc)
-        mlflow.log_metric("precision_fake", report["FAKE"]["precision"])
-        mlflow.log_metric("recall_fake", report["FAKE"]["recall"])
-        mlflow.log_metric("precision_real", report["REAL"]["precision"])
-        mlflow.log_metric("recall_real", report["REAL"]["recall"])
+    if log_to_mlflow:
+        get_run_logger().log_run(metrics={
+            "evaluation_accuracy": acc,
+            "precision_fake": scores["precision_fake"],
+            "recall_fake": scores["recall_fake"],
+            "precision_real": scores["precision_real"],
+            "recall_real": scores["recall_real"],
+        })
 
     print("Accuracy:", acc)
     print("Classification Report:\n", classification_report(y_test, predictions))
     print("Confusion Matrix:\n", confusion)
 
-    return acc, report, confusion
\ No newline at end of file
+    return acc, report, confusion
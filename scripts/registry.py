@@ -0,0 +1,200 @@
+import os
+import json
+import uuid
+import pickle
+import shutil
+import logging
+import tempfile
+import threading
+from datetime import datetime
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+script_dir = os.path.dirname(__file__)
+default_registry_dir = os.getenv("MODEL_REGISTRY_DIR", os.path.join(script_dir, "..", "models"))
+versions_dirname = "versions"
+current_filename = "CURRENT"
+
+# model and vectorizer are None when only the compact inference model was loaded
+LoadedModel = namedtuple("LoadedModel", ["version", "model", "vectorizer", "metadata", "compact"], defaults=[None])
+
+# mkdtemp and mkstemp create private 0700/0600 entries, published ones get the usual
+# umask modes so replicas running as another user can read them
+_umask = os.umask(0)
+os.umask(_umask)
+
+
+def _fsync_write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _versions_dir(registry_dir):
+    return os.path.join(registry_dir or default_registry_dir, versions_dirname)
+
+
+def list_versions(registry_dir=None):
+    """Return published versions, oldest first."""
+    versions_dir = _versions_dir(registry_dir)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir) if not name.startswith("."))
+
+
+def get_current_version(registry_dir=None):
+    """Return the version the CURRENT pointer names, or None before the first publish."""
+    try:
+        with open(os.path.join(registry_dir or default_registry_dir, current_filename)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def set_current_version(version, registry_dir=None):
+    """Atomically point CURRENT at a published version."""
+    registry_dir = registry_dir or default_registry_dir
+    if version not in list_versions(registry_dir):
+        raise ValueError(f"Unknown model version: {version}")
+    fd, tmp_path = tempfile.mkstemp(prefix=".current-", dir=registry_dir)
+    os.close(fd)
+    os.chmod(tmp_path, 0o666 & ~_umask)
+    _fsync_write(tmp_path, version.encode())
+    os.replace(tmp_path, os.path.join(registry_dir, current_filename))
+
+
+def publish_model(model, vectorizer, metadata=None, registry_dir=None, keep=None, compact=None):
+    """
+    Write the model and vectorizer into a new version directory and make it current.
+    Both files are written to a staging directory that is renamed into place in one step,
+    so readers only ever see complete pairs. A compact inference model, when given, is
+    published alongside them. Returns the new version name.
+    """
+    registry_dir = registry_dir or default_registry_dir
+    versions_dir = _versions_dir(registry_dir)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    # Names sort in publish order, the suffix keeps replicas publishing at once apart
+    version = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:8]}"
+    staging = tempfile.mkdtemp(prefix=".staging-", dir=versions_dir)
+    try:
+        os.chmod(staging, 0o777 & ~_umask)
+        _fsync_write(os.path.join(staging, "model.pkl"), pickle.dumps(model))
+        _fsync_write(os.path.join(staging, "vectorizer.pkl"), pickle.dumps(vectorizer))
+        if compact is not None:
+            _fsync_write(os.path.join(staging, "compact.pkl"), pickle.dumps(compact))
+        _fsync_write(os.path.join(staging, "metadata.json"), json.dumps({"version": version, **(metadata or {})}).encode())
+        os.rename(staging, os.path.join(versions_dir, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    set_current_version(version, registry_dir)
+    if keep:
+        prune_versions(keep, registry_dir)
+    return version
+
+
+def version_path(version, registry_dir=None):
+    """Return the directory of a published version."""
+    return os.path.join(_versions_dir(registry_dir), version)
+
+
+def load_version(version, registry_dir=None, compact_only=False):
+    """
+    Load a published version's model, vectorizer, metadata and compact model if it has one.
+    With compact_only the full model and vectorizer are skipped when a compact model exists.
+    """
+    path = version_path(version, registry_dir)
+    with open(os.path.join(path, "metadata.json")) as f:
+        metadata = json.load(f)
+    compact = None
+    if os.path.exists(os.path.join(path, "compact.pkl")):
+        with open(os.path.join(path, "compact.pkl"), "rb") as f:
+            compact = pickle.load(f)
+        if compact_only:
+            return LoadedModel(version, None, None, metadata, compact)
+    with open(os.path.join(path, "model.pkl"), "rb") as f:
+        model = pickle.load(f)
+    with open(os.path.join(path, "vectorizer.pkl"), "rb") as f:
+        vectorizer = pickle.load(f)
+    return LoadedModel(version, model, vectorizer, metadata, compact)
+
+
+def rollback(version=None, registry_dir=None):
+    """Point CURRENT at the given version, or at the one published before the current one."""
+    versions = list_versions(registry_dir)
+    if version is None:
+        current = get_current_version(registry_dir)
+        older = [name for name in versions if current is None or name < current]
+        if not older:
+            raise ValueError("No earlier model version to roll back to")
+        version = older[-1]
+    set_current_version(version, registry_dir)
+    return version
+
+
+def prune_versions(keep, registry_dir=None):
+    """Delete the oldest versions beyond the newest `keep`, never the current one."""
+    current = get_current_version(registry_dir)
+    for version in list_versions(registry_dir)[:-keep]:
+        if version != current:
+            shutil.rmtree(version_path(version, registry_dir), ignore_errors=True)
+
+
+class ModelWatcher:
+    """
+    Serves the current model and swaps in newly published versions from a background thread.
+    The model, vectorizer and metadata are replaced together as one tuple, so a caller that
+    took the tuple keeps a consistent pair for the rest of its prediction.
+    With compact_only, versions that have a compact model are served from it alone.
+    """
+
+    def __init__(self, registry_dir=None, interval=5.0, compact_only=False):
+        self.registry_dir = registry_dir
+        self.interval = interval
+        self.compact_only = compact_only
+        self._loaded = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.poll()
+
+    def get(self):
+        """Return the currently served LoadedModel, or None if nothing is published."""
+        return self._loaded
+
+    def poll(self):
+        """Load the current version if it changed. Returns True when a new version was swapped in."""
+        version = get_current_version(self.registry_dir)
+        if version is None or (self._loaded is not None and self._loaded.version == version):
+            return False
+        try:
+            loaded = load_version(version, self.registry_dir, compact_only=self.compact_only)
+        except Exception as e:  # Unpickling can raise almost anything on a bad file
+            logger.error("Could not load model version %s: %s", version, e)
+            return False
+        self._loaded = loaded
+        logger.info("Serving model version %s", version)
+        return True
+
+    def start(self):
+        """Start polling for new versions in the background."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Model watcher poll failed")  # Keep watching, the next poll may succeed
@@ -222,3 +222,1035 @@
 #     """Test inserting an article with invalid data."""
 #     with pytest.raises(sqlite3.IntegrityError):
 #         insert_article(None, None, None, db_path=test_db)
+
+
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import db
+
+
+@pytest.fixture
+def article_db(tmp_path, monkeypatch):
+    """Fixture to create a seeded articles.db in a temporary working directory."""
+    monkeypatch.chdir(tmp_path)
+    seed = pd.DataFrame({
+        "title": ["Title 1", "Title 2", "Title 3"],
+        "content": ["Content 1", "Content 2", "Content 3"],
+        "label": ["REAL", "FAKE", "REAL"]
+    })
+    db.init_db(seed, db_path=str(tmp_path / "articles.db"))
+    db.clear_query_cache()
+    yield str(tmp_path / "articles.db")
+    db.clear_query_cache()
+
+
+# Query Cache Tests
+def test_query_cache_serves_until_write(article_db):
+    """Cached reads are reused until a write bumps the data version."""
+    first = db.fetch_recent_articles(limit=5)
+
+    # A write behind the cache's back is not visible yet
+    conn = sqlite3.connect(article_db)
+    conn.execute("INSERT INTO articles (title, content, label) VALUES ('Hidden', 'Hidden', 'REAL')")
+    conn.commit()
+    conn.close()
+    assert db.fetch_recent_articles(limit=5) == first
+
+    article_id = db.insert_article("New Title", "New Content", "FAKE")
+    recent = db.fetch_recent_articles(limit=5)
+    assert recent[0][0] == article_id
+    assert recent != first
+
+
+def test_query_cache_write_paths_invalidate(article_db):
+    """Every write path bumps the data version."""
+    article_id = db.insert_article("Title", "Content", "FAKE")
+    version = db.get_data_version()
+    db.add_user_article_relation(1, article_id)
+    assert db.get_data_version() > version
+
+    version = db.get_data_version()
+    db.toggle_article_label(article_id)
+    assert db.get_data_version() > version
+
+    version = db.get_data_version()
+    db.delete_article(article_id)
+    assert db.get_data_version() > version
+
+
+def test_query_cache_ttl_expires(article_db, monkeypatch):
+    """Entries older than the TTL are refreshed even without a version change."""
+    monkeypatch.setattr(db, "query_cache_ttl", 0)
+    db.fetch_recent_articles(limit=5)
+    conn = sqlite3.connect(article_db)
+    conn.execute("INSERT INTO articles (title, content, label) VALUES ('Other', 'Other', 'REAL')")
+    conn.commit()
+    conn.close()
+    assert db.fetch_recent_articles(limit=5)[0][1] == "Other"
+
+
+def test_query_cache_is_bounded(article_db, monkeypatch):
+    """Per-argument entries are capped and stale ones are dropped on writes."""
+    monkeypatch.setattr(db, "query_cache_size", 3)
+    for user_id in range(10):
+        db.fetch_articles_for_user(user_id)
+    assert len(db._query_cache) == 3
+    assert len(db._query_locks) == 3
+
+    db.insert_article("Title", "Content", "FAKE")
+    assert len(db._query_cache) == 0
+    assert len(db._query_locks) == 0
+
+
+def test_query_cache_single_query_for_concurrent_readers(article_db):
+    """Concurrent sessions missing the cache trigger a single query."""
+    calls = []
+    barrier = threading.Barrier(20)
+
+    @db.cached_query
+    def slow_query(limit):
+        calls.append(limit)
+        threading.Event().wait(0.05)
+        return [limit]
+
+    def reader():
+        barrier.wait()
+        assert slow_query(3) == [3]
+
+    threads = [threading.Thread(target=reader) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [3]
+
+
+# Chart Rendering Tests
+def test_chart_rendering_releases_figures():
+    """Rendering the data breakdown closes every figure and keeps RSS flat over many reruns."""
+    import gc
+    import logging
+
+    import matplotlib.pyplot as plt
+    import streamlit as st
+
+    from components import cached_bar_chart, data_breakdown
+
+    def current_rss_kb():
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+    def rerun(i):
+        cached_bar_chart.clear()  # Render every chart instead of serving it from the cache
+        data_breakdown({"title": f"Article {i}", "confidence": (i % 20) / 20})
+
+    st.session_state["accuracy"] = 0.85
+    # Bare mode logs a warning on every rerun, and the records pytest keeps would count as growth
+    logging.disable(logging.WARNING)
+    try:
+        # Warm up matplotlib's glyph and renderer caches and let the allocator settle
+        for i in range(30):
+            rerun(i)
+        gc.collect()
+        baseline_kb = current_rss_kb()
+
+        for i in range(50):  # 150 charts
+            rerun(i)
+        gc.collect()
+        growth_kb = current_rss_kb() - baseline_kb
+    finally:
+        logging.disable(logging.NOTSET)
+
+    assert plt.get_fignums() == []
+    assert growth_kb < 5 * 1024  # Leaking every figure grows RSS by about 250 MB here
+
+    # Identical inputs are served from the cache
+    args = (("True", "Fake"), (0.25, 0.75), ("blue", "orange"), "Classification Confidence")
+    assert cached_bar_chart(*args) == cached_bar_chart(*args)
+    assert cached_bar_chart(*args).startswith(b"\x89PNG")
+    assert plt.get_fignums() == []
+
+
+# Explanation Tests
+def test_explain_prediction_matches_dense_attribution():
+    """Sparse explanations match a dense per-feature attribution over the whole vocabulary."""
+    import numpy as np
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+
+    from model import explain_prediction
+
+    texts = ["aliens built the pyramids", "senate passes budget bill", "aliens control the senate", "budget vote delayed"]
+    vectorizer = CountVectorizer()
+    model = MultinomialNB().fit(vectorizer.fit_transform(texts), ["FAKE", "REAL", "FAKE", "REAL"])
+
+    text = "aliens aliens delay the budget"
+    explanation = explain_prediction(model, vectorizer, text, top_n=3)
+
+    dense = vectorizer.transform([text]).toarray()[0]
+    fake, real = list(model.classes_).index("FAKE"), list(model.classes_).index("REAL")
+    attribution = dense * (model.feature_log_prob_[fake] - model.feature_log_prob_[real])
+    names = vectorizer.get_feature_names_out()
+    expected = sorted(((names[i], attribution[i]) for i in np.flatnonzero(dense)), key=lambda pair: -abs(pair[1]))[:3]
+
+    assert [token for token, _ in explanation] == [token for token, _ in expected]
+    assert np.allclose([weight for _, weight in explanation], [weight for _, weight in expected])
+    assert explanation[0] == ("aliens", pytest.approx(attribution[vectorizer.vocabulary_["aliens"]]))
+
+
+# Instrumentation Tests
+def test_instrument_records_latency_and_errors(monkeypatch):
+    """Instrumented calls are counted, timed, flagged as slow and exported."""
+    import json
+
+    import metrics
+
+    metrics.reset()
+
+    @metrics.instrument
+    def work(fail=False):
+        if fail:
+            raise ValueError("boom")
+        return 42
+
+    metrics.set_slow_call_threshold(f"{work.__module__}.work", 0.0)
+    assert work() == 42
+    with pytest.raises(ValueError):
+        work(fail=True)
+
+    stats = metrics.snapshot()[f"{work.__module__}.work"]
+    assert stats["count"] == 2
+    assert stats["errors"] == 1
+    assert stats["slow"] == 2
+    assert sum(stats["buckets"].values()) == 2
+
+    assert json.loads(metrics.to_json())[f"{work.__module__}.work"]["count"] == 2
+    prometheus = metrics.to_prometheus()
+    assert f'app_call_duration_seconds_count{{function="{work.__module__}.work"}} 2' in prometheus
+    assert 'le="+Inf"} 2' in prometheus
+
+    # Disabled metrics call straight through without recording
+    monkeypatch.setattr(metrics, "enabled", False)
+    assert work() == 42
+    assert metrics.snapshot()[f"{work.__module__}.work"]["count"] == 2
+
+
+def test_db_functions_are_instrumented(article_db):
+    """Public db.py functions report their calls."""
+    import metrics
+
+    metrics.reset()
+    db.fetch_popular_articles(limit=5)
+    db.insert_article("Title", "Content", "REAL")
+    snapshot = metrics.snapshot()
+    assert snapshot["db.fetch_popular_articles"]["count"] == 1
+    assert snapshot["db.insert_article"]["count"] == 1
+
+
+def test_popular_articles_count_links(article_db):
+    """The trigger-maintained user_count matches the number of linked users."""
+    db.register_user("reader", "pw")
+    db.add_user_article_relation(2, 3)
+    db.add_user_article_relation(2, 3)  # Duplicate links are ignored
+    popular = db.fetch_popular_articles(limit=5)
+    assert [(row[0], row[5]) for row in popular] == [(3, 2), (1, 1), (2, 1)]
+
+    conn = sqlite3.connect(article_db)
+    conn.execute("DELETE FROM user_articles WHERE user_id = 2")
+    assert conn.execute("SELECT user_count FROM articles WHERE id = 3").fetchone()[0] == 1
+    conn.close()
+
+
+# Query Plan Tests
+# Plan steps that are expected for a statement, keyed by a fragment of its SQL
+expected_plan_steps = {
+    "ORDER BY RANDOM()": {"SCAN articles", "USE TEMP B-TREE FOR ORDER BY"},  # Sampling has to visit every row
+    "FROM reports r": {"SCAN r"},  # The admin panel lists every report
+    "FROM articles ORDER BY id DESC LIMIT": {"SCAN articles"},  # Rowid order, stops after LIMIT rows
+}
+
+
+@pytest.fixture
+def large_db(tmp_path, monkeypatch):
+    """Fixture to create a seeded database large enough for the planner to prefer indexes."""
+    import random
+
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(0)
+    seed = pd.DataFrame({
+        "title": [f"Title {i}" for i in range(5000)],
+        "content": [f"Content {i}" for i in range(5000)],
+        "label": [rng.choice(["REAL", "FAKE"]) for _ in range(5000)]
+    })
+    db_path = str(tmp_path / "articles.db")
+    db.init_db(seed, db_path=db_path)
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT INTO users (username, password, user_type) VALUES (?, 'pw', 'normal')",
+                     [(f"user{i}",) for i in range(500)])
+    conn.executemany("INSERT OR IGNORE INTO user_articles (user_id, article_id) VALUES (?, ?)",
+                     [(rng.randint(2, 501), rng.randint(1, 5000)) for _ in range(20000)])
+    conn.executemany("INSERT OR IGNORE INTO reports (user_id, article_id, report_content) VALUES (?, ?, 'Wrong label')",
+                     [(rng.randint(2, 501), rng.randint(1, 5000)) for _ in range(300)])
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    db.clear_query_cache()
+    yield db_path
+    db.clear_query_cache()
+
+
+def test_query_plans_use_indexes(large_db, monkeypatch):
+    """Every statement db.py runs avoids full table scans and temp B-tree sorts."""
+    statements = []
+    connect = sqlite3.connect
+
+    def tracing_connect(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    monkeypatch.setattr(sqlite3, "connect", tracing_connect)
+    article_id = db.insert_article("Plan Title", "Plan Content", "REAL")
+    db.add_user_article_relation(2, article_id)
+    db.register_user("planner", "pw")
+    db.authenticate_user("planner", "pw")
+    db.get_guest_user_id()
+    db.fetch_article(article_id)
+    db.fetch_articles(limit=10)
+    db.fetch_popular_articles(limit=5)
+    db.fetch_recent_articles(limit=5)
+    db.fetch_random_articles(limit=5)
+    db.fetch_articles_for_user(2)
+    db.add_report(2, article_id, "This article is inaccurate.")
+    db.fetch_all_reports()
+    db.toggle_article_label(article_id)
+    db.delete_report(2, article_id)
+    db.delete_article(article_id)
+    monkeypatch.undo()
+
+    checked = [sql for sql in statements if sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE"))]
+    assert len(checked) >= 14
+
+    conn = sqlite3.connect(large_db)
+    failures = []
+    for sql in checked:
+        allowed = set().union(*(steps for fragment, steps in expected_plan_steps.items() if fragment in sql))
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+        for detail in plan:
+            full_scan = detail.startswith("SCAN") and " USING " not in detail
+            if (full_scan or "TEMP B-TREE" in detail) and detail not in allowed:
+                failures.append(f"{' '.join(sql.split())}: {detail}")
+    conn.close()
+
+    assert not failures, "\n".join(failures)
+
+
+# Evaluation Tests
+@pytest.fixture
+def corpus():
+    """Fixture to provide a small separable dataset."""
+    import random
+
+    rng = random.Random(0)
+    fake_words = ["aliens", "shocking", "miracle", "secret", "hoax", "exposed"]
+    real_words = ["senate", "budget", "report", "minister", "economy", "vote"]
+    rows = []
+    for i in range(200):
+        label = "FAKE" if i % 2 else "REAL"
+        words = fake_words if label == "FAKE" else real_words
+        rows.append({
+            "title": " ".join(rng.choices(words, k=3)),
+            "content": " ".join(rng.choices(words + fake_words[:2] + real_words[:2], k=20)),
+            "label": label
+        })
+    return pd.DataFrame(rows)
+
+
+def test_cross_validate_model_caches_folds(corpus, monkeypatch):
+    """Cross-validation reuses cached folds and scores every fold in the pool."""
+    import evaluation
+
+    evaluation.clear_fold_cache()
+    summary = evaluation.cross_validate_model(corpus, n_splits=4, n_jobs=2, log_to_mlflow=False)
+    assert summary["accuracy"] > 0.9
+    assert summary["confusion"].sum() == len(corpus)
+    assert len(evaluation._fold_cache) == 1
+
+    # A second evaluation of the same corpus does not vectorize again
+    monkeypatch.setattr(evaluation, "_vectorize_fold", None)
+    again = evaluation.cross_validate_model(corpus, n_splits=4, alpha=0.5, n_jobs=2, log_to_mlflow=False)
+    assert again["confusion"].sum() == len(corpus)
+    evaluation.clear_fold_cache()
+
+
+def test_evaluate_model_writes_no_artifacts(corpus, tmp_path, monkeypatch):
+    """Evaluation computes metrics without re-pickling the model or vectorizer."""
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.naive_bayes import MultinomialNB
+
+    from model import evaluate_model
+
+    monkeypatch.chdir(tmp_path)
+    vectorizer = CountVectorizer()
+    x = vectorizer.fit_transform(corpus["title"] + " " + corpus["content"])
+    model = MultinomialNB().fit(x, corpus["label"])
+
+    accuracy, report, confusion = evaluate_model(model, vectorizer, x, corpus["label"], log_to_mlflow=False)
+    assert accuracy == report["accuracy"]
+    assert "REAL" in report and "FAKE" in report
+    assert confusion.sum() == len(corpus)
+    assert list(tmp_path.iterdir()) == []
+
+
+# Backend Tests
+def test_backends_benchmark_and_selection(corpus):
+    """Every backend is benchmarked on shared features and the fastest one above the floor is selected."""
+    from backends import backends
+    from benchmark import benchmark_backends, select_backend
+
+    results = benchmark_backends(corpus, latency_sample=20)
+    assert [result["backend"] for result in results] == list(backends)
+    for result in results:
+        assert result["accuracy"] > 0.8
+        assert result["model_bytes"] > 0
+        assert result["per_doc_ms"] > 0
+
+    assert select_backend(results, accuracy_floor=1.1) is None
+    fastest = min(results, key=lambda result: result["per_doc_ms"])["backend"]
+    assert select_backend(results, accuracy_floor=0.0) == fastest
+
+    # Per-backend alphas are applied, so selection scores the configuration that gets trained
+    tuned = benchmark_backends(corpus, names=["multinomial_nb", "sgd"], alpha={"multinomial_nb": 0.1}, latency_sample=5)
+    assert [result["alpha"] for result in tuned] == [0.1, 1e-4]
+
+
+@pytest.mark.parametrize("name", ["multinomial_nb", "complement_nb", "sgd"])
+def test_explain_prediction_for_backends(corpus, name):
+    """Explanations work for naive Bayes and linear backends."""
+    from backends import get_backend
+    from model import explain_prediction
+
+    backend = get_backend(name)
+    vectorizer = backend.make_vectorizer()
+    model = backend.make_classifier().fit(vectorizer.fit_transform(corpus["title"] + " " + corpus["content"]), corpus["label"])
+    explanation = dict(explain_prediction(model, vectorizer, "shocking aliens hoax in senate budget"))
+    assert explanation["hoax"] > 0
+    assert explanation["budget"] < 0
+
+
+# Preprocessing Tests
+def test_normalization_parity():
+    """Vectorized training normalization matches per-string inference normalization."""
+    from utils import clean_text, normalize_texts
+
+    texts = pd.Series([
+        "  Breaking NEWS:\tAliens  land\n in Ohio ",
+        "Read more at https://example.com/story?id=1 or www.example.org",
+        "Ｆｕｌｌｗｉｄｔｈ ＴＥＸＴ and ﬁ ligatures",
+        "ΣΊΣΥΦΟΣ Ünïcödé Straße",
+        "line\u2028separator\u3000space",
+        "",
+    ])
+    assert normalize_texts(texts).tolist() == [clean_text(text) for text in texts]
+    assert clean_text("Visit https://fake.news NOW") == "visit now"
+
+
+def test_prediction_parity_and_token_cache(corpus, monkeypatch):
+    """Inference vectorizes raw text exactly like training and reuses cached tokens."""
+    import utils
+    from backends import get_backend
+    from model import predict
+    from utils import clean_text, prepare_texts
+
+    utils.clear_token_cache()
+    vectorizer = get_backend().make_vectorizer()
+    x = vectorizer.fit_transform(prepare_texts(corpus))
+    model = get_backend().make_classifier().fit(x, corpus["label"])
+
+    raw = corpus["title"] + " " + corpus["content"]
+    per_string = vectorizer.transform([clean_text(text) for text in raw])
+    assert (per_string != x).nnz == 0
+    assert [predict(model, vectorizer, text) for text in raw[:20]] == list(model.predict(x[:20]))
+
+    # Retraining on the same corpus is served from the token cache
+    monkeypatch.setattr(utils, "token_pattern", None)
+    retrained = get_backend().make_vectorizer().fit_transform(prepare_texts(corpus))
+    assert (retrained != x).nnz == 0
+    utils.clear_token_cache()
+
+
+def test_retraining_hits_token_cache_larger_than_budget(corpus, monkeypatch):
+    """Refitting a corpus bigger than the token budget still reuses the documents cached first."""
+    import utils
+    from utils import prepare_texts, tokenize
+    from vectorize import ParallelCountVectorizer
+
+    texts = list(prepare_texts(corpus))
+    total = sum(len(utils.token_pattern.findall(text)) for text in texts)
+    monkeypatch.setattr(utils, "token_cache_tokens", total // 2)
+    utils.clear_token_cache()
+    first = ParallelCountVectorizer(analyzer=tokenize, n_jobs=1).fit_transform(texts)
+    assert 0 < utils._token_cache_total <= total // 2
+
+    misses = []
+    pattern = utils.token_pattern
+
+    class CountingPattern:
+        def findall(self, text):
+            misses.append(text)
+            return pattern.findall(text)
+
+    monkeypatch.setattr(utils, "token_pattern", CountingPattern())
+    again = ParallelCountVectorizer(analyzer=tokenize, n_jobs=1).fit_transform(texts)
+    assert (again != first).nnz == 0
+    hit_rate = 1 - len(misses) / len(texts)
+    assert hit_rate >= 0.4
+    utils.clear_token_cache()
+
+
+def test_token_cache_is_bounded_by_tokens(monkeypatch):
+    """The token cache evicts least recently used documents once its token budget is spent."""
+    import utils
+
+    monkeypatch.setattr(utils, "token_cache_tokens", 10)
+    utils.clear_token_cache()
+    first = utils.tokenize("aa bb cc dd")
+    utils.tokenize("ee ff gg hh")
+    utils.tokenize("aa bb cc dd")  # Most recently used now
+    utils.tokenize("ii jj kk")
+    assert utils._token_cache_total == 7
+    assert len(utils._token_cache) == 2
+    assert utils.tokenize("aa bb cc dd") is first
+    assert utils.tokenize(" ".join(["zz"] * 11)) == ("zz",) * 11  # Too long to cache
+    assert utils._token_cache_total == 7
+    utils.clear_token_cache()
+
+
+# MLflow Logging Tests
+@pytest.fixture
+def tracking_store(tmp_path, monkeypatch):
+    """Fixture to point MLflow at a local file-based tracking store."""
+    import mlflow
+
+    monkeypatch.setenv("MLFLOW_ALLOW_FILE_STORE", "true")  # Newer MLflow versions refuse file stores otherwise
+    uri = (tmp_path / "mlruns").as_uri()
+    mlflow.set_tracking_uri(uri)
+    yield uri
+    mlflow.set_tracking_uri(None)
+
+
+def test_async_run_logger_writes_to_file_store(tracking_store, tmp_path):
+    """Queued runs land in the tracking store with params, metrics and artifacts after a flush."""
+    import mlflow
+
+    from tracking import AsyncRunLogger
+
+    artifact = tmp_path / "model.pkl"
+    artifact.write_bytes(b"model")
+    run_logger = AsyncRunLogger(max_queue=10)
+    assert run_logger.log_run(params={"alpha": 0.1}, metrics={"test_accuracy": 0.9}, artifacts=[(str(artifact), "model")])
+    run_logger.close()
+
+    runs = mlflow.search_runs(search_all_experiments=True, output_format="list")
+    assert len(runs) == 1
+    assert runs[0].data.params == {"alpha": "0.1"}
+    assert runs[0].data.metrics == {"test_accuracy": 0.9}
+    assert [item.path for item in mlflow.MlflowClient().list_artifacts(runs[0].info.run_id, "model")] == ["model/model.pkl"]
+
+
+def test_async_run_logger_bounded_queue(tracking_store):
+    """A full queue drops runs under the drop policy instead of blocking the caller."""
+    from tracking import AsyncRunLogger
+
+    release = threading.Event()
+    run_logger = AsyncRunLogger(max_queue=2, policy="drop")
+    run_logger._write = lambda record: release.wait()
+
+    results = [run_logger.log_run(metrics={"step": i}) for i in range(6)]
+    assert results.count(False) == run_logger.dropped >= 3
+    assert not run_logger.flush(timeout=0.05)
+
+    release.set()
+    assert run_logger.flush(timeout=5)
+    run_logger.close()
+
+
+def test_async_run_logger_close_does_not_hang_on_stalled_store(tracking_store):
+    """close() returns after its timeout even when the worker is stuck and the queue is full."""
+    import time
+
+    from tracking import AsyncRunLogger
+
+    release = threading.Event()
+    run_logger = AsyncRunLogger(max_queue=2, policy="drop")
+    run_logger._write = lambda record: release.wait()
+    for i in range(4):
+        run_logger.log_run(metrics={"step": i})
+
+    start = time.monotonic()
+    run_logger.close(timeout=0.2)
+    assert time.monotonic() - start < 2
+    release.set()
+
+
+def test_train_model_logs_in_background(corpus, tracking_store, tmp_path):
+    """Training returns before MLflow logging finishes and the run appears after a flush."""
+    import mlflow
+
+    from model import train_model
+    from tracking import get_run_logger
+
+    model, vectorizer, accuracy = train_model(corpus, registry_dir=str(tmp_path / "models"), alpha=0.5)
+    assert accuracy > 0.9
+    assert get_run_logger().flush(timeout=30)
+
+    runs = mlflow.search_runs(search_all_experiments=True, output_format="list")
+    assert runs[0].data.params["alpha"] == "0.5"
+    assert runs[0].data.params["model_type"] == "MultinomialNB"
+
+
+# Model Registry Tests
+def test_publish_rollback_and_prune(tmp_path):
+    """Published versions become current atomically and older ones stay available for rollback."""
+    import registry
+
+    registry_dir = str(tmp_path)
+    assert registry.get_current_version(registry_dir) is None
+
+    first = registry.publish_model({"name": "first"}, {"vocab": 1}, metadata={"accuracy": 0.8}, registry_dir=registry_dir)
+    second = registry.publish_model({"name": "second"}, {"vocab": 2}, metadata={"accuracy": 0.9}, registry_dir=registry_dir)
+    assert registry.list_versions(registry_dir) == [first, second]
+    assert registry.get_current_version(registry_dir) == second
+    assert not [name for name in os.listdir(tmp_path / "versions") if name.startswith(".")]
+
+    # Other users can read what was published, as with files created under the umask
+    assert os.stat(tmp_path / "versions" / second).st_mode & 0o777 == 0o777 & ~registry._umask
+    assert os.stat(tmp_path / "CURRENT").st_mode & 0o777 == 0o666 & ~registry._umask
+
+    loaded = registry.load_version(second, registry_dir)
+    assert loaded.model == {"name": "second"} and loaded.vectorizer == {"vocab": 2}
+    assert loaded.metadata == {"version": second, "accuracy": 0.9}
+
+    assert registry.rollback(registry_dir=registry_dir) == first
+    assert registry.get_current_version(registry_dir) == first
+    with pytest.raises(ValueError):
+        registry.set_current_version("missing", registry_dir)
+
+    # Pruning never removes the current version
+    registry.prune_versions(1, registry_dir)
+    assert registry.list_versions(registry_dir) == [first, second]
+    registry.set_current_version(second, registry_dir)
+    registry.prune_versions(1, registry_dir)
+    assert registry.list_versions(registry_dir) == [second]
+
+
+def test_model_watcher_swaps_pairs_without_mixing(tmp_path):
+    """The watcher swaps in new versions while readers always see a matching model and vectorizer."""
+    import registry
+
+    registry_dir = str(tmp_path)
+    registry.publish_model({"version": 0}, {"version": 0}, registry_dir=registry_dir)
+    watcher = registry.ModelWatcher(registry_dir=registry_dir, interval=0.01).start()
+
+    mismatches = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            _, model, vectorizer, _, _ = watcher.get()
+            if model != vectorizer:
+                mismatches.append((model, vectorizer))
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for i in range(1, 20):
+        registry.publish_model({"version": i}, {"version": i}, registry_dir=registry_dir)
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert not mismatches
+    watcher.poll()
+    assert watcher.get().model == {"version": 19}
+    watcher.stop()
+
+
+def _raise_on_load(error):
+    raise error
+
+
+class _FailsToUnpickle:
+    """Pickles fine, raises the given error when unpickled."""
+
+    def __init__(self, error):
+        self.error = error
+
+    def __reduce__(self):
+        return _raise_on_load, (self.error,)
+
+
+def test_model_watcher_survives_broken_versions(tmp_path):
+    """Versions that fail to unpickle are skipped and the watcher keeps polling."""
+    import time
+
+    import registry
+
+    registry_dir = str(tmp_path)
+    good = registry.publish_model({"version": "good"}, {"version": "good"}, registry_dir=registry_dir)
+    watcher = registry.ModelWatcher(registry_dir=registry_dir, interval=0.01).start()
+
+    for error in (EOFError(), AttributeError("Model"), ModuleNotFoundError("missing_module")):
+        registry.publish_model(_FailsToUnpickle(error), {}, registry_dir=registry_dir)
+        time.sleep(0.1)
+        assert watcher._thread.is_alive()
+        assert watcher.get().version == good
+
+    fixed = registry.publish_model({"version": "fixed"}, {"version": "fixed"}, registry_dir=registry_dir)
+    deadline = time.monotonic() + 5
+    while watcher.get().version != fixed and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert watcher.get().model == {"version": "fixed"}
+    watcher.stop()
+
+
+# Storage Tests
+def test_content_is_compressed_transparently(article_db):
+    """Long content is stored compressed and read back as text."""
+    content = "The senate passed the budget bill after a long debate. " * 20
+    article_id = db.insert_article("Budget", content, "REAL")
+
+    conn = sqlite3.connect(article_db)
+    stored = conn.execute("SELECT content FROM articles WHERE id = ?", (article_id,)).fetchone()[0]
+    conn.close()
+    assert isinstance(stored, bytes) and len(stored) < len(content)
+
+    assert db.fetch_article(article_id) == ("REAL", content)
+    assert db.fetch_recent_articles(limit=1)[0][2] == content
+    assert db.fetch_articles_for_user(1)[0][2] == "Content 1"
+
+
+def test_migration_compresses_existing_rows(tmp_path, monkeypatch):
+    """Databases created before compression get their content compressed on the next start."""
+    monkeypatch.chdir(tmp_path)
+    content = "Plain text content that repeats itself. " * 10
+    conn = sqlite3.connect("articles.db")
+    conn.execute("CREATE TABLE articles (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, content TEXT NOT NULL, label TEXT NOT NULL, confidence REAL DEFAULT 1.0)")
+    conn.execute("CREATE TABLE user_articles (user_id INTEGER NOT NULL, article_id INTEGER NOT NULL, PRIMARY KEY (user_id, article_id))")
+    conn.execute("CREATE TABLE reports (user_id INTEGER NOT NULL, article_id INTEGER NOT NULL, report_content TEXT NOT NULL, PRIMARY KEY (user_id, article_id))")
+    conn.execute("INSERT INTO articles (title, content, label) VALUES ('Old', ?, 'REAL')", (content,))
+    conn.commit()
+
+    db.migrate_db(conn)
+    stored = conn.execute("SELECT content FROM articles").fetchone()[0]
+    conn.close()
+    assert isinstance(stored, bytes)
+    assert db.decompress_content(stored) == content
+
+
+def test_init_db_skips_unchanged_seed(article_db):
+    """Restarting with the same seed data keeps existing article rows."""
+    seed = pd.DataFrame({
+        "title": ["Title 1", "Title 2", "Title 3"],
+        "content": ["Content 1", "Content 2", "Content 3"],
+        "label": ["REAL", "FAKE", "REAL"]
+    })
+    db.register_user("writer", "pw")
+    article_id = db.insert_article("User Title", "User Content", "FAKE")
+    db.add_user_article_relation(2, article_id)
+    guest_id = db.get_guest_user_id()
+    popular = sorted((row[0], row[5]) for row in db.fetch_popular_articles(limit=10))
+    guest_articles = sorted(row[0] for row in db.fetch_articles_for_user(guest_id))
+
+    db.init_db.clear()
+    db.init_db(seed, db_path=article_db)
+    assert db.fetch_article(article_id) == ("FAKE", "User Content")
+    # The restart does not link the guest to surviving submissions or inflate their popularity
+    assert sorted((row[0], row[5]) for row in db.fetch_popular_articles(limit=10)) == popular
+    assert sorted(row[0] for row in db.fetch_articles_for_user(guest_id)) == guest_articles
+    assert article_id not in guest_articles
+
+
+def test_compact_db_removes_duplicates_and_orphans(article_db, monkeypatch):
+    """Compaction merges duplicate articles and drops rows that point at missing articles or users."""
+    first = db.insert_article("Same", "Same content", "FAKE")
+    second = db.insert_article("Same", "Same content", "FAKE")
+    # Identical long texts stored under different compression levels are duplicates too
+    text = "Repeated words compress well. " * 50
+    monkeypatch.setattr(db, "content_compression_level", 1)
+    kept = db.insert_article("Long", text, "REAL")
+    monkeypatch.setattr(db, "content_compression_level", 9)
+    recompressed = db.insert_article("Long", text, "REAL")
+    db.register_user("reader", "pw")
+    db.add_user_article_relation(2, second)
+    db.add_report(2, second, "This article is inaccurate.")
+    db.add_user_article_relation(2, 999)
+    db.add_report(99, 1, "Reported by a deleted user.")
+
+    stats = db.compact_db(article_db)
+    assert stats["duplicate_articles"] == 2
+    assert db.fetch_article(recompressed) is None
+    assert db.fetch_article(kept) == ("REAL", text)
+    assert stats["orphaned_user_articles"] == 1
+    assert stats["orphaned_reports"] == 1
+    assert stats["size_after"] > 0
+
+    assert db.fetch_article(second) is None
+    assert [row[0] for row in db.fetch_articles_for_user(2)] == [first]
+    assert db.fetch_all_reports() == [(first, "Same", "This article is inaccurate.", 2)]
+    popular = {row[0]: row[5] for row in db.fetch_popular_articles(limit=10)}
+    assert popular[first] == 1
+
+
+# Parallel Vectorizer Tests
+def test_parallel_vectorizer_matches_serial(corpus):
+    """Sharded vocabulary building yields the same vocabulary and counts as CountVectorizer."""
+    from sklearn.feature_extraction.text import CountVectorizer
+
+    import utils
+    from utils import prepare_texts, tokenize
+    from vectorize import ParallelCountVectorizer
+
+    texts = list(prepare_texts(corpus)) + ["unique words only here", "ünïcödé tokens 42"]
+    serial = CountVectorizer(analyzer=tokenize)
+    parallel = ParallelCountVectorizer(analyzer=tokenize, n_jobs=3, min_parallel_docs=0)
+    expected = serial.fit_transform(texts)
+    utils.clear_token_cache()  # A warm cache would take the serial path
+    actual = parallel.fit_transform(texts)
+
+    assert parallel.vocabulary_ == serial.vocabulary_
+    assert actual.shape == expected.shape and actual.dtype == expected.dtype
+    expected.sort_indices()
+    assert np.array_equal(actual.indptr, expected.indptr)
+    assert np.array_equal(actual.indices, expected.indices)
+    assert np.array_equal(actual.data, expected.data)
+    assert (parallel.transform(texts[:5]) != serial.transform(texts[:5])).nnz == 0
+
+    # Default word analyzer works across processes too
+    words = ParallelCountVectorizer(n_jobs=2, min_parallel_docs=0).fit(texts)
+    assert words.vocabulary_ == CountVectorizer().fit(texts).vocabulary_
+
+
+def test_parallel_vectorizer_fills_token_cache(corpus, monkeypatch):
+    """Tokens from worker processes land in the parent's cache and a warm corpus skips the pool."""
+    import utils
+    import vectorize
+    from utils import prepare_texts, tokenize
+    from vectorize import ParallelCountVectorizer
+
+    texts = list(prepare_texts(corpus))
+    utils.clear_token_cache()
+    first = ParallelCountVectorizer(analyzer=tokenize, n_jobs=2, min_parallel_docs=0)
+    x = first.fit_transform(texts)
+    assert all(utils.cached_tokens(text) is not None for text in texts)
+
+    monkeypatch.setattr(vectorize, "ProcessPoolExecutor", None)
+    monkeypatch.setattr(utils, "token_pattern", None)
+    again = ParallelCountVectorizer(analyzer=tokenize, n_jobs=2, min_parallel_docs=0)
+    assert (again.fit_transform(texts) != x).nnz == 0
+    assert again.vocabulary_ == first.vocabulary_
+    utils.clear_token_cache()
+
+
+def test_parallel_vectorizer_returns_tokens_within_cache_budget(corpus, monkeypatch):
+    """Workers only send back the token lists the parent's cache has room for."""
+    import utils
+    from utils import prepare_texts, tokenize
+    from vectorize import ParallelCountVectorizer
+
+    texts = list(prepare_texts(corpus))
+    total = sum(len(tokenize(text)) for text in texts)
+    utils.clear_token_cache()
+    monkeypatch.setattr(utils, "token_cache_tokens", total // 3)
+    vectorizer = ParallelCountVectorizer(analyzer=tokenize, n_jobs=2, min_parallel_docs=0)
+    expected = ParallelCountVectorizer(analyzer=tokenize).fit_transform(texts)
+    utils.clear_token_cache()
+
+    x = vectorizer.fit_transform(texts)
+    assert (x != expected).nnz == 0
+    assert 0 < utils._token_cache_total <= total // 3
+    assert utils.token_cache_free() == total // 3 - utils._token_cache_total
+    utils.clear_token_cache()
+
+
+def test_benchmark_vectorizer_reports_speedup(corpus):
+    """The vectorizer benchmark times each worker count against the serial run."""
+    from benchmark import benchmark_vectorizer
+
+    results = benchmark_vectorizer(corpus, worker_counts=(1, 2), repeat=1)
+    assert [result["workers"] for result in results] == [1, 2]
+    assert results[0]["speedup"] == 1.0
+    assert results[1]["speedup"] == pytest.approx(results[0]["seconds"] / results[1]["seconds"])
+    assert all(result["seconds"] > 0 and result["cpus"] >= 1 for result in results)
+
+
+# Compact Model Tests
+@pytest.mark.parametrize("name,dtype,tolerance", [
+    ("multinomial_nb", "float32", 1e-5),
+    ("multinomial_nb", "uint8", 1e-2),
+    ("complement_nb", "float32", 1e-5),
+    ("sgd", "float32", 1e-5),
+])
+def test_compact_model_matches_full_model(corpus, name, dtype, tolerance):
+    """The compact inference form is smaller and scores within tolerance of the full model."""
+    from backends import get_backend
+    from compact import CompactModel, compare_models
+    from utils import prepare_texts
+
+    corpus = corpus.copy()
+    corpus["content"] += [f" rare{i} word{i * 7}" for i in range(len(corpus))]
+    backend = get_backend(name)
+    vectorizer = backend.make_vectorizer()
+    model = backend.make_classifier().fit(vectorizer.fit_transform(prepare_texts(corpus)), corpus["label"])
+
+    texts = list(corpus["title"] + " " + corpus["content"]) + ["Unseen WORDS only", ""]
+    report = compare_models(model, vectorizer, texts, dtype=dtype, tolerance=tolerance)
+    assert report["within_tolerance"], report
+    assert report["agreement"] == 1.0
+    assert report["saved_bytes"] > 0
+
+    compact = CompactModel.from_estimator(model, vectorizer, dtype=dtype)
+    assert compact.weights.dtype == np.dtype(dtype)
+    assert compact.predict("shocking aliens hoax exposed") == "FAKE"
+
+
+@pytest.mark.parametrize("name", ["multinomial_nb", "complement_nb", "sgd"])
+def test_compact_model_explains_like_full_model(corpus, name):
+    """Explanations from the compact model match explain_prediction on the full model."""
+    from backends import get_backend
+    from compact import CompactModel
+    from model import explain_prediction
+    from utils import prepare_texts
+
+    backend = get_backend(name)
+    vectorizer = backend.make_vectorizer()
+    model = backend.make_classifier().fit(vectorizer.fit_transform(prepare_texts(corpus)), corpus["label"])
+    compact = CompactModel.from_estimator(model, vectorizer)
+
+    for text in list(corpus["title"] + " " + corpus["content"])[:20] + ["Unseen aliens, unseen hoax"]:
+        expected = dict(explain_prediction(model, vectorizer, text, top_n=100))
+        assert dict(compact.explain(text, top_n=100)) == pytest.approx(expected, rel=1e-5)
+        # float32 weights may swap near ties, so the top tokens are compared by weight
+        top = [abs(weight) for _, weight in compact.explain(text, top_n=5)]
+        assert top == pytest.approx(sorted(map(abs, expected.values()), reverse=True)[:5], rel=1e-5)
+    assert compact.explain("") == []
+    assert compact.explain("zzzunknown qqqunknown") == []
+
+
+# Write Buffer Tests
+def test_write_buffer_groups_writes_into_one_transaction(article_db):
+    """Queued inserts and links commit together and resolve to their article ids."""
+    buffer = db.WriteBuffer(article_db, max_batch=50, max_delay=60)
+    version = db.get_data_version()
+    futures = [buffer.insert_article(f"Buffered {i}", f"Content {i}", "FAKE", user_id=1) for i in range(10)]
+    link = buffer.add_user_article_relation(1, 2)
+    assert not any(future.done() for future in futures)  # Neither threshold reached yet
+
+    assert buffer.flush(timeout=5)
+    assert buffer.batches == 1
+    assert db.get_data_version() > version
+    ids = [future.result() for future in futures]
+    assert link.result() is None
+    assert ids == sorted(ids) and len(set(ids)) == 10
+    assert db.fetch_article(ids[3]) == ("FAKE", "Content 3")
+    assert set(ids) <= {article_id for article_id, *_ in db.fetch_articles_for_user(1)}
+
+    # Reaching max_batch writes without waiting for the delay
+    futures = [buffer.insert_article("Full", "Batch", "REAL") for _ in range(50)]
+    assert all(future.result(timeout=5) for future in futures)
+    buffer.close()
+    with pytest.raises(RuntimeError):
+        buffer.insert_article("Late", "Write", "REAL")
+
+
+def test_write_buffer_close_flushes_and_isolates_failures(article_db):
+    """Closing writes pending rows, and a failed write fails only its own future."""
+    buffer = db.WriteBuffer(article_db, max_batch=1000, max_delay=60)
+    pending = buffer.insert_article("Pending", "At shutdown", "REAL")
+    buffer.close()
+    assert db.fetch_article(pending.result(timeout=0)) == ("REAL", "At shutdown")
+
+    buffer = db.WriteBuffer(article_db, max_batch=3, max_delay=60)
+    good = buffer.insert_article("Good", "Row", "REAL")
+    bad = buffer.insert_article("Bad", "Row", None)  # Violates NOT NULL
+    also_good = buffer.insert_article("Also good", "Row", "FAKE", user_id=1)
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=5)
+    assert db.fetch_article(good.result(timeout=5)) == ("REAL", "Row")
+    assert db.fetch_article(also_good.result(timeout=5)) == ("FAKE", "Row")
+    assert buffer.batches == 1
+    buffer.close()
+    conn = sqlite3.connect(article_db)
+    assert conn.execute("SELECT COUNT(*) FROM articles WHERE title = 'Bad'").fetchone()[0] == 0
+    conn.close()
+
+
+def test_write_buffer_skips_cancelled_writes(article_db, monkeypatch):
+    """Cancelled writes are not committed and neither they nor a failing batch stop the writer."""
+    buffer = db.WriteBuffer(article_db, max_batch=1000, max_delay=60)
+    cancelled = buffer.insert_article("Cancelled", "Row", "REAL")
+    kept = buffer.insert_article("Kept", "Row", "REAL")
+    assert cancelled.cancel()
+    assert buffer.flush(timeout=5)
+    assert db.fetch_article(kept.result(timeout=0)) == ("REAL", "Row")
+    conn = sqlite3.connect(article_db)
+    assert conn.execute("SELECT COUNT(*) FROM articles WHERE title = 'Cancelled'").fetchone()[0] == 0
+    conn.close()
+
+    # An unexpected error fails the batch but the writer keeps going
+    write_batch = db.WriteBuffer._write_batch
+    monkeypatch.setattr(db.WriteBuffer, "_write_batch", lambda self, conn, batch: 1 / 0)
+    failed = buffer.insert_article("Failed", "Row", "REAL")
+    assert buffer.flush(timeout=5)
+    with pytest.raises(ZeroDivisionError):
+        failed.result(timeout=0)
+    monkeypatch.setattr(db.WriteBuffer, "_write_batch", write_batch)
+    after = buffer.insert_article("After", "Row", "REAL")
+    assert buffer.flush(timeout=5)
+    assert db.fetch_article(after.result(timeout=0)) == ("REAL", "Row")
+    buffer.close()
+
+
+def test_benchmark_db_writes_buffer_on_and_off(article_db):
+    """The write load test reports throughput and commits with and without the buffer."""
+    from benchmark import benchmark_db_writes
+
+    unbuffered = benchmark_db_writes(article_db, rows=40, writers=4)
+    buffered = benchmark_db_writes(article_db, rows=40, writers=4, buffered=True)
+    assert unbuffered["rows"] == buffered["rows"] == 40
+    assert unbuffered["transactions"] == 80
+    assert buffered["transactions"] <= 40
+    assert buffered["rows_per_second"] > 0
+
+
+def test_compact_model_is_published_and_served(corpus, tracking_store, tmp_path):
+    """Training publishes a compact model that the watcher can serve without the full model."""
+    import registry
+    from model import explain_prediction, predict, train_model
+    from tracking import get_run_logger
+
+    registry_dir = str(tmp_path / "models")
+    model, vectorizer, _ = train_model(corpus, registry_dir=registry_dir, alpha=0.25)
+    get_run_logger().flush(timeout=30)
+    version = registry.get_current_version(registry_dir)
+    assert os.path.exists(os.path.join(registry.version_path(version, registry_dir), "compact.pkl"))
+
+    watcher = registry.ModelWatcher(registry_dir=registry_dir, compact_only=True)
+    served = watcher.get()
+    assert served.version == version
+    assert served.model is None and served.vectorizer is None
+    texts = list(corpus["title"] + " " + corpus["content"])[:50]
+    assert [predict(None, None, text, compact=served.compact) for text in texts] == \
+        [predict(model, vectorizer, text) for text in texts]
+
+    # Explanations are served from the compact model as well
+    explanation = explain_prediction(None, None, texts[0], compact=served.compact)
+    assert dict(explanation) == pytest.approx(dict(explain_prediction(model, vectorizer, texts[0])), rel=1e-5)
@@ -0,0 +1,136 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+import mlflow
+from mlflow.entities import Metric, Param
+from mlflow.tracking import MlflowClient
+
+logger = logging.getLogger(__name__)
+
+_stop = object()
+
+
+class AsyncRunLogger:
+    """
+    Logs MLflow params, metrics and artifacts from a background thread so training and
+    app startup never wait on the tracking store.
+    Each submitted run is written with one batched params/metrics call. Artifacts are
+    copied by the worker after the caller has moved on.
+    The queue is bounded: with the "block" policy a full queue makes callers wait up to
+    block_timeout seconds before the run is dropped, with the "drop" policy it is dropped at once.
+    """
+
+    def __init__(self, max_queue=100, policy="block", block_timeout=5.0):
+        if policy not in ("block", "drop"):
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def log_run(self, params=None, metrics=None, artifacts=None):
+        """
+        Queue a run for logging. artifacts is a list of (local_path, artifact_path) pairs.
+        Logs into the caller's active run if there is one, otherwise into a new run.
+        Returns False when the run was dropped.
+        """
+        active = mlflow.active_run()
+        record = {
+            "run_id": active.info.run_id if active else None,
+            "params": dict(params or {}),
+            "metrics": dict(metrics or {}),
+            "artifacts": list(artifacts or []),
+            "timestamp": int(time.time() * 1000),
+        }
+        self._start()
+        try:
+            if self.policy == "drop":
+                self._queue.put_nowait(record)
+            else:
+                self._queue.put(record, timeout=self.block_timeout)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("MLflow logging queue is full, dropped a run (%d dropped so far)", self.dropped)
+            return False
+        return True
+
+    def flush(self, timeout=None):
+        """Wait until every queued run is written. Returns False on timeout."""
+        with self._queue.all_tasks_done:
+            return self._queue.all_tasks_done.wait_for(lambda: self._queue.unfinished_tasks == 0, timeout)
+
+    def close(self, timeout=30.0):
+        """Flush queued runs and stop the worker thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        flushed = self.flush(timeout)
+        try:
+            self._queue.put_nowait(_stop)
+        except queue.Full:
+            pass  # The worker is stuck on the tracking store, leave it to die with the process
+        else:
+            thread.join(timeout)
+        if not flushed:
+            logger.warning("MLflow logging queue was not fully flushed at shutdown")
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="mlflow-logger", daemon=True)
+                self._thread.start()
+
+    def _work(self):
+        while True:
+            record = self._queue.get()
+            try:
+                if record is _stop:
+                    return
+                self._write(record)
+            except Exception as e:
+                self.failed += 1
+                logger.error("MLflow logging failed: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, record):
+        client = MlflowClient()
+        run_id = record["run_id"]
+        if run_id is None:
+            with mlflow.start_run() as run:
+                self._write_to_run(client, run.info.run_id, record)
+        else:
+            self._write_to_run(client, run_id, record)
+
+    def _write_to_run(self, client, run_id, record):
+        client.log_batch(
+            run_id,
+            metrics=[Metric(key, float(value), record["timestamp"], 0) for key, value in record["metrics"].items()],
+            params=[Param(key, str(value)) for key, value in record["params"].items()],
+        )
+        for local_path, artifact_path in record["artifacts"]:
+            client.log_artifact(run_id, local_path, artifact_path=artifact_path)
+
+
+_run_logger = None
+_run_logger_lock = threading.Lock()
+
+
+def get_run_logger():
+    """Return the process-wide run logger, configured from MLFLOW_QUEUE_SIZE and MLFLOW_QUEUE_POLICY."""
+    global _run_logger
+    with _run_logger_lock:
+        if _run_logger is None:
+            _run_logger = AsyncRunLogger(
+                max_queue=int(os.getenv("MLFLOW_QUEUE_SIZE", "100")),
+                policy=os.getenv("MLFLOW_QUEUE_POLICY", "block"),
+            )
+            atexit.register(_run_logger.close)
+        return _run_logger
@@ -1,2 +1,140 @@
+import os
+import re
+import sys
+import hashlib
+import threading
+import contextlib
+import unicodedata
+from collections import OrderedDict
+
+# Same patterns are used per string and through pandas' vectorized string methods
+url_pattern = r"(?:https?://|www\.)\S+"
+whitespace_pattern = r"\s+"
+token_pattern = re.compile(r"(?u)\b\w\w+\b")  # CountVectorizer's default tokens
+
+_url_re = re.compile(url_pattern)
+_whitespace_re = re.compile(whitespace_pattern)
+
+
 def clean_text(text):
-    return text.strip().lower()
+    """Normalize a single text the same way normalize_texts does for a whole column."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    text = _url_re.sub(" ", text)
+    return _whitespace_re.sub(" ", text).strip()
+
+
+def normalize_texts(texts):
+    """Normalize a pandas Series of texts with vectorized string operations."""
+    # Object dtype keeps Python string and regex semantics, the Arrow string backend differs on Unicode
+    return (
+        texts.astype(object).fillna("")
+        .str.normalize("NFKC")
+        .str.casefold()
+        .str.replace(url_pattern, " ", regex=True)
+        .str.replace(whitespace_pattern, " ", regex=True)
+        .str.strip()
+    )
+
+
+def prepare_texts(data):
+    """Combine title and content and normalize them for the model."""
+    return normalize_texts(data['title'] + " " + data['content'])
+
+
+# Token lists cached by content hash, shared by every vectorizer in the process.
+# The cache is bounded by the total number of cached tokens. Tokens are interned, so
+# a cached document costs one pointer per token plus its tuple.
+token_cache_tokens = int(os.getenv("TOKEN_CACHE_TOKENS", "2000000"))
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+_token_cache_total = 0
+_token_cache_scan = threading.local()
+
+
+def tokenize(text):
+    """
+    CountVectorizer analyzer for normalized text. Repeated articles and retraining on the
+    same corpus reuse cached tokens instead of running the tokenizer again.
+    """
+    key = _text_key(text)
+    tokens = _lookup_tokens(key)
+    if tokens is None:
+        tokens = _store_tokens(key, token_pattern.findall(text))
+    return tokens
+
+
+def cached_tokens(text):
+    """Return the cached token list of a text, or None if it is not cached."""
+    return _lookup_tokens(_text_key(text))
+
+
+def cache_tokens(text, tokens):
+    """Store the token list of a text, e.g. one tokenized in a worker process, and return it as cached."""
+    return _store_tokens(_text_key(text), tokens)
+
+
+def _text_key(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _lookup_tokens(key):
+    with _token_cache_lock:
+        tokens = _token_cache.get(key)
+        if tokens is not None:
+            _token_cache.move_to_end(key)
+        return tokens
+
+
+def _admits(size):
+    # In scan mode only documents that fit the free budget are cached, nothing is evicted
+    if size > token_cache_tokens:
+        return False
+    return not getattr(_token_cache_scan, "active", False) or _token_cache_total + size <= token_cache_tokens
+
+
+def _store_tokens(key, tokens):
+    # Evict least recently used token lists until the cache is back under its token budget
+    global _token_cache_total
+    if not _admits(len(tokens)):
+        return tuple(tokens)  # Interning only pays off for cached lists
+    tokens = tuple(map(sys.intern, tokens))
+    with _token_cache_lock:
+        if not _admits(len(tokens)):
+            return tokens
+        previous = _token_cache.pop(key, None)
+        if previous is not None:
+            _token_cache_total -= len(previous)
+        _token_cache[key] = tokens
+        _token_cache_total += len(tokens)
+        while _token_cache_total > token_cache_tokens:
+            _, evicted = _token_cache.popitem(last=False)
+            _token_cache_total -= len(evicted)
+    return tokens
+
+
+def token_cache_free():
+    """Number of tokens the cache can still take without evicting anything."""
+    return max(token_cache_tokens - _token_cache_total, 0)
+
+
+@contextlib.contextmanager
+def token_cache_scan():
+    """
+    While a corpus is vectorized the token cache only admits documents that fit in its free
+    budget and evicts nothing. A corpus larger than the cache then keeps hitting on the
+    documents cached first, where LRU eviction in corpus order would miss on every one.
+    """
+    previous = getattr(_token_cache_scan, "active", False)
+    _token_cache_scan.active = True
+    try:
+        yield
+    finally:
+        _token_cache_scan.active = previous
+
+
+def clear_token_cache():
+    """Drop all cached token lists."""
+    global _token_cache_total
+    with _token_cache_lock:
+        _token_cache.clear()
+        _token_cache_total = 0
@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer
+import utils
+from utils import cache_tokens, cached_tokens, token_cache_free, token_cache_scan, tokenize
+
+
+def _disable_token_cache():
+    # Worker processes are short-lived, caching their tokens would only cost time
+    utils.token_cache_tokens = 0
+
+
+def _count_shard(analyze, documents, token_budget=0):
+    # Same counting as CountVectorizer._count_vocab, with ids local to this shard.
+    # Token lists are sent back for the parent's cache until token_budget tokens are used
+    vocabulary = {}
+    indices = []
+    values = []
+    indptr = [0]
+    token_lists = []
+    for document in documents:
+        counter = {}
+        features = analyze(document)
+        for feature in features:
+            index = vocabulary.setdefault(feature, len(vocabulary))
+            counter[index] = counter.get(index, 0) + 1
+        indices.extend(counter.keys())
+        values.extend(counter.values())
+        indptr.append(len(indices))
+        if len(features) <= token_budget:
+            token_lists.append(features)
+            token_budget -= len(features)
+        else:
+            token_budget = 0
+    return (list(vocabulary), np.asarray(indices, dtype=np.int64), np.asarray(values, dtype=np.int64),
+            np.asarray(indptr, dtype=np.int64), token_lists)
+
+
+class ParallelCountVectorizer(CountVectorizer):
+    """
+    CountVectorizer whose fit_transform tokenizes shards of the corpus in worker processes.
+    Shard vocabularies are merged into the same sorted vocabulary the serial path builds and
+    the counts are stitched into one CSR matrix, so the output is identical to CountVectorizer.
+    Small corpora and n_jobs=1 use the serial path. Both fitting and transform use the token
+    cache in scan mode, see utils.token_cache_scan.
+    With the utils.tokenize analyzer, workers send token lists back to fill the free part of
+    the parent's token cache, and a corpus that is already cached takes the serial path.
+    """
+
+    _parameter_constraints = {
+        **CountVectorizer._parameter_constraints,
+        "n_jobs": [None, int],
+        "min_parallel_docs": [int],
+    }
+
+    def __init__(self, analyzer="word", n_jobs=None, min_parallel_docs=2000):
+        super().__init__(analyzer=analyzer)
+        self.n_jobs = n_jobs
+        self.min_parallel_docs = min_parallel_docs
+
+    def fit_transform(self, raw_documents, y=None):
+        with token_cache_scan():
+            return self._fit_transform(raw_documents, y)
+
+    def transform(self, raw_documents):
+        with token_cache_scan():
+            return super().transform(raw_documents)
+
+    def _fit_transform(self, raw_documents, y=None):
+        if isinstance(raw_documents, str):
+            raise ValueError("Iterable over raw text documents expected, string object received.")
+        documents = list(raw_documents)
+        workers = min(self.n_jobs or os.cpu_count() or 1, len(documents))
+        if workers <= 1 or len(documents) < self.min_parallel_docs:
+            return super().fit_transform(documents, y)
+        # Cached tokens are faster to count in place than to ship to workers
+        caches_tokens = self.analyzer is tokenize
+        if caches_tokens and all(cached_tokens(document) is not None for document in documents):
+            return super().fit_transform(documents, y)
+
+        # Workers only send back as many tokens as the parent's cache has room for
+        shard_budget = token_cache_free() // workers if caches_tokens else 0
+        analyze = self.build_analyzer()
+        bounds = np.linspace(0, len(documents), workers + 1, dtype=int)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_disable_token_cache) as pool:
+            futures = [pool.submit(_count_shard, analyze, documents[start:end], shard_budget)
+                       for start, end in zip(bounds[:-1], bounds[1:])]
+            shards = [future.result() for future in futures]
+        for start, shard in zip(bounds[:-1], shards):
+            for document, tokens in zip(documents[start:], shard[4]):
+                cache_tokens(document, tokens)
+
+        # CountVectorizer numbers features in sorted order, which makes the merge deterministic
+        terms = sorted(set().union(*(shard[0] for shard in shards)))
+        if not terms:
+            raise ValueError("empty vocabulary; perhaps the documents only contain stop words")
+        vocabulary = {term: index for index, term in enumerate(terms)}
+
+        indices, values, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+        offset = 0
+        for shard_terms, shard_indices, shard_values, shard_indptr, _ in shards:
+            mapping = np.fromiter((vocabulary[term] for term in shard_terms), dtype=np.int64, count=len(shard_terms))
+            indices.append(mapping[shard_indices])
+            values.append(shard_values)
+            indptr.append(shard_indptr[1:] + offset)
+            offset += shard_indptr[-1]
+
+        index_dtype = np.int32 if offset <= np.iinfo(np.int32).max else np.int64
+        x = sp.csr_matrix(
+            (np.concatenate(values), np.concatenate(indices).astype(index_dtype), np.concatenate(indptr).astype(index_dtype)),
+            shape=(len(documents), len(terms)),
+            dtype=self.dtype,
+        )
+        x.sort_indices()
+
+        self.vocabulary_ = vocabulary
+        self.fixed_vocabulary_ = False
+        return x